@@ -0,0 +1,149 @@
+"""
+Batch of runs over many elections (data directories). Every pair (election, method) is a separate task
+run in a pool of processes, and metrics of an election are computed in another task as soon as
+all its methods finish. Tasks of larger elections (by size of their data files) are scheduled first,
+so the batch takes about as long as its slowest task and not as the sum of all of them.
+
+Worker processes load data of an election themselves (and keep the last loaded one), so data
+is never sent between processes. With the data cache enabled, all elections are first loaded
+(and cached) once, so later tasks of the same election only read the cache.
+"""
+
+import glob
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Set, Tuple
+
+from .types import InputDataPerGroup
+from .logger import logger
+from .parameters import Parameters, ParametersGroup
+from .load_data import load_input_data, read_constraints
+from .results import MethodOutcome, Results, results_to_json
+from .methods import methods
+from .run import RunOptions, run_method, run_metrics
+
+
+class BatchOptions:
+    methods_to_run: Set[str]
+    metrics_to_run: Set[str]
+    parameters: Parameters
+    jobs: int
+    use_data_cache: bool
+
+    def __init__(self, methods_to_run: Set[str], metrics_to_run: Set[str], parameters: Parameters, jobs: int = 1,
+                 use_data_cache: bool = True):
+        self.methods_to_run = methods_to_run
+        self.metrics_to_run = metrics_to_run
+        self.parameters = parameters
+        self.jobs = jobs
+        self.use_data_cache = use_data_cache
+
+def find_elections(patterns: List[str]) -> List[str]:
+    """
+    Directories matching the given paths or glob patterns, without duplicates.
+    """
+    elections: List[str] = []
+    for pattern in patterns:
+        matched = sorted(p for p in glob.glob(pattern) if os.path.isdir(p))
+        if len(matched) == 0:
+            raise Exception(f"No data directories match: {pattern}")
+        elections.extend(os.path.normpath(p) for p in matched if os.path.normpath(p) not in elections)
+    return elections
+
+def data_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path) if f.endswith('.pb'))
+
+# Data of the last election loaded by this process
+worker_election: Tuple[str, Dict[str, InputDataPerGroup]] | None = None
+
+def election_data(path: str, use_data_cache: bool) -> Dict[str, InputDataPerGroup]:
+    global worker_election
+    if worker_election is None or worker_election[0] != path:
+        worker_election = None
+        cache_path = os.path.join(path, ".cache") if use_data_cache else None
+        worker_election = (path, load_input_data(path, read_constraints(path), 1, cache_path))
+    return worker_election[1]
+
+def load_election(path: str, use_data_cache: bool) -> None:
+    election_data(path, use_data_cache)
+
+def run_election_method(path: str, use_data_cache: bool, name: str, parameters_group: ParametersGroup) -> MethodOutcome:
+    return run_method(election_data(path, use_data_cache), name, parameters_group)
+
+def run_election_metrics(path: str, use_data_cache: bool, outcomes: Dict[str, MethodOutcome],
+                         run_options: RunOptions) -> Results:
+    metrics_scores, district_results = run_metrics(election_data(path, use_data_cache), outcomes, run_options)
+    return Results(outcomes=outcomes, metrics_scores=metrics_scores, district_results=district_results)
+
+def run_batch(elections: List[str], batch_options: BatchOptions) -> Dict[str, Any]:
+    """
+    Returns results of every election in the format of `results.json` (with outcomes of methods
+    under `methods_outcomes` key), or the error if the election failed.
+    """
+    start = time.time()
+    to_run = {
+        name: batch_options.parameters[name] if name in batch_options.parameters else ParametersGroup()
+        for name in methods.keys() if name in batch_options.methods_to_run
+    }
+    run_options = RunOptions(
+        methods_to_run=set(to_run.keys()),
+        metrics_to_run=batch_options.metrics_to_run,
+        parameters=batch_options.parameters,
+        constraints=None,
+        jobs=1,
+    )
+    sizes = { path: data_size(path) for path in elections }
+    # Largest elections first
+    order = sorted(elections, key=lambda path: -sizes[path])
+    use_data_cache = batch_options.use_data_cache
+
+    errors: Dict[str, str] = {}
+    outcomes: Dict[str, Dict[str, MethodOutcome]] = { path: {} for path in elections }
+    results: Dict[str, Results] = {}
+
+    logger.info("Running %d elections x %d methods in %d processes...", len(elections), len(to_run), batch_options.jobs)
+    with ProcessPoolExecutor(max_workers=batch_options.jobs) as executor:
+        if use_data_cache:
+            loads = { path: executor.submit(load_election, path, use_data_cache) for path in order }
+            for path, future in loads.items():
+                try:
+                    future.result()
+                except Exception as ex:
+                    errors[path] = str(ex)
+                    logger.error("Loading %s failed: %s", path, ex)
+
+        pending: Dict[Future, Tuple[str, str | None]] = {
+            executor.submit(run_election_method, path, use_data_cache, name, parameters_group): (path, name)
+            for path in order if path not in errors
+            for name, parameters_group in to_run.items()
+        }
+        while len(pending) > 0:
+            done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                path, name = pending.pop(future)
+                if path in errors:
+                    continue
+                try:
+                    if name is None:
+                        results[path] = future.result()
+                        logger.info("Election %s finished", path)
+                        continue
+                    outcomes[path][name] = future.result()
+                except Exception as ex:
+                    errors[path] = str(ex)
+                    logger.error("Election %s failed: %s", path, ex)
+                    continue
+                if len(outcomes[path]) == len(to_run):
+                    # Outcomes are passed in the order of methods, not in the order of completion
+                    ordered = { n: outcomes[path][n] for n in to_run.keys() }
+                    pending[executor.submit(run_election_metrics, path, use_data_cache, ordered, run_options)] = (path, None)
+
+    logger.info("Batch finished in %.2f seconds", time.time() - start)
+    return {
+        path: { "error": errors[path] } if path in errors else {
+            "methods_outcomes": { name: outcome.selected_projects for name, outcome in results[path].outcomes.items() },
+            **results_to_json(results[path]),
+        }
+        for path in elections
+    }
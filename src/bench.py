@@ -0,0 +1,273 @@
+"""
+Benchmarks of loading data, methods and metrics on data directories and synthetic elections.
+
+Every benchmark is run `repeat` times on a fresh copy of data (so values cached for data,
+like merged groups or approval matrices, are computed again) and the median time is reported.
+Peak memory (of allocations made during the benchmark) is measured in one more run with `tracemalloc`,
+which is not timed, because tracing slows down allocations.
+
+Results can be saved as a baseline (JSON) and compared with a baseline saved earlier.
+Time of importing the CLI is measured too (in fresh interpreters), it should stay within `IMPORT_TIME_BUDGET`
+(enforced by `tests/test_cli_import.py`) and must not import modules from `HEAVY_MODULES`, which are loaded
+only by commands that use them.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+from tabulate import tabulate
+
+from .types import InputDataPerGroup, ProjectsGroup, as_profiles_array
+from .logger import logger
+from .parameters import Parameters, ParametersGroup
+from .load_data import load_data
+from .results import MethodOutcome
+from .mes_engine import ApprovalMatrix
+from .metrics import metrics_binary
+from .methods import methods
+from .run import RunOptions, run_metrics
+from .synthetic import SyntheticOptions, generate_data
+from .utils import approximate_size, get_groups, get_voter_registry
+
+
+BENCH_VERSION = 1
+IMPORT_TIME_BUDGET = 0.15 # seconds
+HEAVY_MODULES = ["numpy", "pydantic", "pabutools", "tabulate"]
+
+Measurement = Dict[str, Any]
+
+class BenchOptions:
+    data_paths: List[str]
+    synthetic: List[SyntheticOptions]
+    scaling: Tuple[str, List[Any]] | None
+    methods_to_run: Set[str]
+    metrics_to_run: Set[str]
+    parameters: Parameters
+    repeat: int
+
+    def __init__(self, data_paths: List[str], synthetic: List[SyntheticOptions], scaling: Tuple[str, List[Any]] | None,
+                 methods_to_run: Set[str], metrics_to_run: Set[str], parameters: Parameters, repeat: int = 3):
+        self.data_paths = data_paths
+        self.synthetic = synthetic
+        self.scaling = scaling
+        self.methods_to_run = methods_to_run
+        self.metrics_to_run = metrics_to_run
+        self.parameters = parameters
+        self.repeat = repeat
+
+def fresh_copy(data: Dict[str, InputDataPerGroup]) -> Dict[str, InputDataPerGroup]:
+    """
+    Shallow copy of data. Values cached for data are looked up by identity of objects,
+    so they are not reused for the copy.
+    """
+    return { name: d.model_copy(update={ "group": d.group.model_copy() }) for name, d in data.items() }
+
+def measure(setup: Callable[[], Any], f: Callable[[Any], Any], repeat: int) -> Measurement:
+    times: List[float] = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        f(argument)
+        times.append(time.perf_counter() - start)
+
+    argument = setup()
+    tracemalloc.start()
+    f(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return { "median": statistics.median(times), "min": min(times), "times": times, "peak_memory": peak }
+
+def method_parameters(parameters: Parameters, name: str) -> ParametersGroup:
+    return parameters[name] if name in parameters else ParametersGroup()
+
+def data_stats(data: Dict[str, InputDataPerGroup]) -> Dict[str, Any]:
+    """
+    Sizes of data, memory used per voter by profiles stored in arrays and by pydantic models,
+    and the number of voter classes (distinct ballots) MES works on in every group.
+    """
+    profiles = [as_profiles_array(d.group.profiles) for d in data.values()]
+    voters = len(get_voter_registry(get_groups(data)))
+    models = [ProjectsGroup.model_construct(projects=d.group.projects, profiles=p.to_models())
+              for d, p in zip(data.values(), profiles)]
+    return {
+        "groups": len(data),
+        "projects": sum(len(d.group.projects) for d in data.values()),
+        "profiles": sum(len(p) for p in profiles),
+        "votes": sum(len(p.votes) for p in profiles),
+        "bytes per voter": round(sum(approximate_size(d.group) for d in data.values()) / voters, 1),
+        "bytes per voter (models)": round(sum(approximate_size(g) for g in models) / voters, 1),
+        "compression ratio": {
+            name: round(ApprovalMatrix.from_profiles(d.group.projects, d.group.profiles).compression_ratio(), 2)
+            for name, d in data.items()
+        },
+    }
+
+def bench_data(data: Dict[str, InputDataPerGroup], bench_options: BenchOptions) -> Dict[str, Measurement]:
+    results: Dict[str, Measurement] = {}
+    outcomes: Dict[str, MethodOutcome] = {}
+    for name in methods.keys():
+        if name not in bench_options.methods_to_run:
+            continue
+        logger.info("Benchmarking method %s...", name)
+        parameters_group = method_parameters(bench_options.parameters, name)
+        results[f"method:{name}"] = measure(lambda: fresh_copy(data), lambda d: methods[name](d, parameters_group),
+                                            bench_options.repeat)
+        outcomes[name] = MethodOutcome(selected_projects=methods[name](data, parameters_group),
+                                       time=results[f"method:{name}"]["median"])
+
+    for metric in sorted(bench_options.metrics_to_run):
+        if metric in metrics_binary and len(outcomes) < 2:
+            continue
+        logger.info("Benchmarking metric %s...", metric)
+        run_options = RunOptions(methods_to_run=set(outcomes.keys()), metrics_to_run={ metric },
+                                 parameters=bench_options.parameters, constraints=None)
+        results[f"metric:{metric}"] = measure(lambda: fresh_copy(data), lambda d: run_metrics(d, outcomes, run_options),
+                                              bench_options.repeat)
+    return results
+
+def bench_data_path(path: str, bench_options: BenchOptions) -> Dict[str, Any]:
+    logger.info("Benchmarking loading of %s...", path)
+    results: Dict[str, Any] = {}
+    results["load_data"] = measure(lambda: None, lambda _: load_data(path), bench_options.repeat)
+    with tempfile.TemporaryDirectory() as cache_path:
+        load_data(path, cache_path=cache_path)
+        results["load_data (cached)"] = measure(lambda: None, lambda _: load_data(path, cache_path=cache_path),
+                                                bench_options.repeat)
+    data = load_data(path)
+    return { "stats": data_stats(data), "benchmarks": results | bench_data(data, bench_options) }
+
+def bench_scaling(bench_options: BenchOptions) -> Dict[str, Any]:
+    """
+    Median times of methods on synthetic elections, where one option (e.g. number of voters) changes.
+    Exponent is the slope of the curve on log-log scale (time ~ size^exponent).
+    """
+    assert bench_options.scaling is not None
+    dimension, values = bench_options.scaling
+    base = bench_options.synthetic[0] if len(bench_options.synthetic) > 0 else SyntheticOptions()
+    curves: Dict[str, List[float]] = { name: [] for name in methods.keys() if name in bench_options.methods_to_run }
+    for value in values:
+        options = SyntheticOptions(**(vars(base) | { dimension: value }))
+        logger.info("Benchmarking scaling for %s...", options)
+        data = generate_data(options)
+        for name in curves.keys():
+            parameters_group = method_parameters(bench_options.parameters, name)
+            curves[name].append(measure(lambda: fresh_copy(data), lambda d: methods[name](d, parameters_group),
+                                        bench_options.repeat)["median"])
+
+    exponents = {
+        name: float(np.polyfit(np.log(values), np.log(times), 1)[0]) if len(values) > 1 else None
+        for name, times in curves.items()
+    }
+    return { "dimension": dimension, "values": values, "base": repr(base), "times": curves, "exponents": exponents }
+
+def measure_cli_import(repeat: int) -> Dict[str, Any]:
+    """
+    Time of `import src.cli` in fresh interpreters and heavy modules imported by it.
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import src.cli\n"
+        "print(json.dumps([time.perf_counter() - start, sorted(sys.modules.keys())]))\n"
+    )
+    root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times: List[float] = []
+    heavy_modules: Set[str] = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root_path, capture_output=True, text=True, check=True)
+        seconds, modules = json.loads(output.stdout)
+        times.append(seconds)
+        heavy_modules |= { m for m in modules if m.split(".")[0] in HEAVY_MODULES }
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "times": times,
+        "heavy_modules": sorted({ m.split(".")[0] for m in heavy_modules }),
+    }
+
+def check_cli_import(cli_import: Dict[str, Any], max_import_time: float | None) -> None:
+    if len(cli_import["heavy_modules"]) > 0:
+        raise Exception(f"CLI imports heavy modules: {', '.join(cli_import['heavy_modules'])}")
+    if max_import_time is not None and cli_import["median"] > max_import_time:
+        raise Exception(f"CLI import takes {cli_import['median']:.3f} s (budget: {max_import_time} s)")
+
+def run_bench(bench_options: BenchOptions) -> Dict[str, Any]:
+    datasets: Dict[str, Any] = {}
+    for path in bench_options.data_paths:
+        try:
+            datasets[path] = bench_data_path(path, bench_options)
+        except Exception as ex:
+            logger.warning("Skipping %s: %s", path, ex)
+            datasets[path] = { "error": str(ex) }
+    for options in bench_options.synthetic:
+        data = generate_data(options)
+        datasets[f"synthetic({options})"] = { "stats": data_stats(data), "benchmarks": bench_data(data, bench_options) }
+
+    return {
+        "version": BENCH_VERSION,
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "repeat": bench_options.repeat,
+        "cli_import": measure_cli_import(bench_options.repeat),
+        "datasets": datasets,
+        "scaling": bench_scaling(bench_options) if bench_options.scaling is not None else None,
+    }
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+    """
+    Ratios of median times to median times from the baseline, for benchmarks present in both.
+    """
+    ratios: Dict[Tuple[str, str], float] = {}
+    for dataset, result in results["datasets"].items():
+        baseline_benchmarks = baseline.get("datasets", {}).get(dataset, {}).get("benchmarks", {})
+        for name, measurement in result.get("benchmarks", {}).items():
+            if name in baseline_benchmarks and baseline_benchmarks[name]["median"] > 0:
+                ratios[(dataset, name)] = measurement["median"] / baseline_benchmarks[name]["median"]
+    return ratios
+
+def format_bench(results: Dict[str, Any], ratios: Dict[Tuple[str, str], float]) -> str:
+    lines: List[str] = []
+    cli_import = results["cli_import"]
+    lines.append(f"CLI import: {cli_import['median']:.4f} s (budget: {IMPORT_TIME_BUDGET} s), "
+                 f"heavy modules: {', '.join(cli_import['heavy_modules']) or 'none'}\n")
+    for dataset, result in results["datasets"].items():
+        lines.append(f"{dataset}")
+        if "error" in result:
+            lines.append(f"error: {result['error']}\n")
+            continue
+        lines.append(", ".join(f"{key}: {value}" for key, value in result["stats"].items()))
+        table = [
+            [name, m["median"], m["min"], m["peak_memory"] / 2**20,
+             ratios.get((dataset, name))]
+            for name, m in result["benchmarks"].items()
+        ]
+        lines.append(tabulate(table, headers=["Benchmark", "Median (s)", "Min (s)", "Peak memory (MB)", "vs baseline"],
+                              floatfmt=".4f", missingval="-"))
+        lines.append("")
+
+    scaling = results["scaling"]
+    if scaling is not None:
+        lines.append(f"Scaling with {scaling['dimension']} (base: {scaling['base']})")
+        table = [
+            [name, *times, scaling["exponents"][name]]
+            for name, times in scaling["times"].items()
+        ]
+        lines.append(tabulate(table, headers=["Method", *map(str, scaling["values"]), "Exponent"],
+                              floatfmt=".4f", missingval="-"))
+    return "\n".join(lines)
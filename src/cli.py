@@ -1,19 +1,25 @@
 import argparse
 import json
 import os
-from typing import Any, Dict
-from tabulate import tabulate
+from typing import TYPE_CHECKING, Any, Dict, List
 
-from .results import save_results
-from .load_data import load_data
 from .logger import logger
-from .parameters import get_default_parameters
-from .metrics import metrics_unary_desc, metrics_binary_desc
-from .methods import methods_desc
-from .run import RunOptions, run
+from .parameters import Parameters, get_default_parameters
+from .registry import methods_desc, metrics_unary_desc, metrics_binary_desc
+
+# Modules running commands import NumPy, pydantic and pabutools, so they are imported only by commands that use them
+if TYPE_CHECKING:
+    from .run import RunOptions
+    from .bench import BenchOptions
+    from .batch import BatchOptions
+    from .sweep import SweepOptions
+    from .outcome_cache import OutcomeCache
+    from .serve import ServeOptions
+    from .live import LiveElection
 
 
 def print_methods() -> None:
+    from tabulate import tabulate
     print("Available methods:")
     table = [
         [name, desc] for name, desc in methods_desc.items()
@@ -21,6 +27,7 @@ def print_methods() -> None:
     print(tabulate(table, headers=["Name", "Description"]))
 
 def print_metrics() -> None:
+    from tabulate import tabulate
     print("Available metrics:")
     table = [
         *([name, desc, False] for name, desc in metrics_unary_desc.items()),
@@ -28,19 +35,149 @@ def print_metrics() -> None:
     ]
     print(tabulate(table, headers=["Name", "Description", "Compares results of two methods?"]))
 
-def execute_run(data_path: str, result_path: str, run_options: RunOptions) -> None:
-    data = load_data(data_path)
+def execute_run(data_path: str, result_path: str, run_options: "RunOptions", load_workers: int = 1,
+                data_cache_path: str | None = None) -> None:
+    from .instrumentation import collect
+    from .load_data import load_input_data
+    from .results import save_results
+    from .run import run
 
-    if run_options.constraints is not None:
-        for group, constraint in run_options.constraints.items():
-            if group not in data:
-                raise Exception(f"Group {group} is not in data")
-            data[group].constraint = constraint
+    with collect() as load_profile:
+        data = load_input_data(data_path, run_options.constraints, load_workers, data_cache_path)
 
     results = run(data, run_options)
+    results.profile = { "load": load_profile, **(results.profile or {}) }
 
     save_results(results, result_path)
 
+def execute_sweep(data_path: str, output_path: str, sweep_options: "SweepOptions", load_workers: int = 1,
+                  data_cache_path: str | None = None) -> None:
+    from .load_data import load_input_data
+    from .sweep import run_sweep, save_sweep
+
+    data = load_input_data(data_path, sweep_options.constraints, load_workers, data_cache_path)
+
+    rows = run_sweep(data, sweep_options)
+
+    save_sweep(rows, output_path)
+    logger.info("Sweep results saved to %s", output_path)
+
+def execute_batch(elections: List[str], output_path: str, batch_options: "BatchOptions") -> None:
+    from .batch import run_batch
+
+    results = run_batch(elections, batch_options)
+
+    with open(output_path, 'w', encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+    logger.info("Batch results saved to %s", output_path)
+
+def execute_serve(elections: List[str], serve_options: "ServeOptions", use_data_cache: bool = True) -> None:
+    import asyncio
+    from .serve import load_elections, serve
+
+    loaded = load_elections(elections, use_data_cache)
+    try:
+        asyncio.run(serve(loaded, serve_options))
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+
+def execute_watch(live: "LiveElection", output_path: str, run_options: "RunOptions", interval: float,
+                  iterations: int = 0) -> None:
+    from .live import watch
+
+    try:
+        watch(live, run_options, output_path, interval, iterations)
+    except KeyboardInterrupt:
+        logger.info("Watching stopped")
+
+def execute_bench(bench_options: "BenchOptions", output_path: str | None, baseline_path: str | None,
+                  max_slowdown: float | None, max_import_time: float | None) -> None:
+    from .bench import check_cli_import, compare_with_baseline, format_bench, run_bench
+
+    results = run_bench(bench_options)
+
+    ratios = {}
+    if baseline_path is not None:
+        with open(baseline_path, 'r', encoding="utf-8") as file:
+            ratios = compare_with_baseline(results, json.load(file))
+    print(format_bench(results, ratios))
+
+    if output_path is not None:
+        with open(output_path, 'w', encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+        logger.info("Benchmark results saved to %s", output_path)
+
+    if max_slowdown is not None:
+        slower = [f"{dataset} {name} ({ratio:.2f}x)" for (dataset, name), ratio in ratios.items() if ratio > max_slowdown]
+        if len(slower) > 0:
+            raise Exception(f"Slower than baseline: {', '.join(slower)}")
+    check_cli_import(results["cli_import"], max_import_time)
+
+def add_parameters_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        '-p',
+        '--parameter',
+        type=str,
+        dest='parameters',
+        action='append',
+        help='parameter to set (format key=value)',
+    )
+    parser.add_argument(
+        '--parameters_file',
+        type=str,
+        dest='parameters_file',
+        help='path to a file with parameters (in json format)',
+    )
+
+def add_data_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        '-d',
+        '--data',
+        type=str,
+        dest='data_path',
+        required=True,
+        help='path to data',
+    )
+    parser.add_argument(
+        '--load_workers',
+        type=int,
+        dest='load_workers',
+        default=1,
+        help='number of processes used to load data files',
+    )
+    parser.add_argument(
+        '--data_cache',
+        type=str,
+        dest='data_cache_path',
+        help='path to a directory with cache of parsed data files (default: `.cache` in data directory)',
+    )
+    parser.add_argument(
+        '--no_data_cache',
+        action='store_true',
+        dest='no_data_cache',
+        help='parse data files without using the cache',
+    )
+
+def add_outcome_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        '--outcome_cache',
+        type=str,
+        dest='outcome_cache_path',
+        help='path to a directory with cache of outcomes of methods (default: `.cache/outcomes` in data directory)',
+    )
+    parser.add_argument(
+        '--outcome_cache_size',
+        type=int,
+        dest='outcome_cache_size',
+        help='maximal size of the cache of outcomes in MB, 64 by default (least recently used outcomes are removed)',
+    )
+    parser.add_argument(
+        '--no_cache',
+        action='store_true',
+        dest='no_outcome_cache',
+        help='run all methods without using the cache of outcomes',
+    )
+
 def cli_prepare() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(
@@ -53,6 +190,30 @@ def cli_prepare() -> argparse.ArgumentParser:
         "run",
         help="run methods and compare them with metrics",
     )
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="run methods for a grid of parameters values and compare them with metrics",
+    )
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="run methods on many elections and compare them with metrics",
+    )
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="benchmark loading data, methods and metrics",
+    )
+    generate_parser = subparsers.add_parser(
+        "generate",
+        help="generate a synthetic election and save it as .pb files",
+    )
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="keep elections in memory and run methods and metrics on them on requests (HTTP)",
+    )
+    watch_parser = subparsers.add_parser(
+        "watch",
+        help="read votes appended to data files and keep outcomes and metrics up to date",
+    )
     methods_parser = subparsers.add_parser(
         "methods",
         help="list available methods",
@@ -80,7 +241,192 @@ def cli_prepare() -> argparse.ArgumentParser:
         action='append',
         help='metric to run on methods outcomes (`all` to run all metrics)',
     )
+    add_data_arguments(run_parser)
+    run_parser.add_argument(
+        '-r',
+        '--results',
+        type=str,
+        dest='results_path',
+        required=True,
+        help='path to a directory where results will be saved in folder in format: "YYYY-MM-DD HH:MM:SS"',
+    )
+    add_parameters_arguments(run_parser)
+    run_parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        dest='jobs',
+        default=1,
+        help='number of processes used to run methods',
+    )
     run_parser.add_argument(
+        '--profile',
+        action='store_true',
+        dest='cprofile',
+        help='profile methods with cProfile and save stats (`[method].prof`) and flame graphs (`[method].svg`) with results',
+    )
+    add_outcome_cache_arguments(run_parser)
+
+    sweep_parser.add_argument(
+        '-m',
+        '--method',
+        type=str,
+        dest='methods',
+        choices=[*methods_desc.keys()] + ["all"],
+        action='append',
+        help='method to run (`all` to run all methods)',
+    )
+    sweep_parser.add_argument(
+        '-mc',
+        '--metric',
+        type=str,
+        dest='metrics',
+        choices=[*metrics_unary_desc.keys()] + ["all"],
+        action='append',
+        help='metric to run on outcomes of every configuration (`all` to run all metrics)',
+    )
+    sweep_parser.add_argument(
+        '-s',
+        '--sweep',
+        type=str,
+        dest='sweep',
+        action='append',
+        help='values of a parameter to sweep (format key=v1,v2,... or key=start:stop:step)',
+    )
+    add_data_arguments(sweep_parser)
+    sweep_parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        dest='output_path',
+        required=True,
+        help='path to a CSV file where the table of results will be saved',
+    )
+    add_parameters_arguments(sweep_parser)
+    sweep_parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        dest='jobs',
+        default=1,
+        help='number of processes used to run configurations',
+    )
+    add_outcome_cache_arguments(sweep_parser)
+
+    batch_parser.add_argument(
+        '-m',
+        '--method',
+        type=str,
+        dest='methods',
+        choices=[*methods_desc.keys()] + ["all"],
+        action='append',
+        help='method to run (`all` to run all methods)',
+    )
+    batch_parser.add_argument(
+        '-mc',
+        '--metric',
+        type=str,
+        dest='metrics',
+        choices=[*metrics_unary_desc.keys(), *metrics_binary_desc.keys()] + ["all"],
+        action='append',
+        help='metric to run on methods outcomes (`all` to run all metrics)',
+    )
+    batch_parser.add_argument(
+        '-d',
+        '--data',
+        type=str,
+        dest='data_paths',
+        action='append',
+        required=True,
+        help='path to data of an election or a glob pattern matching many of them',
+    )
+    batch_parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        dest='output_path',
+        required=True,
+        help='path to a JSON file where results of all elections will be saved',
+    )
+    add_parameters_arguments(batch_parser)
+    batch_parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        dest='jobs',
+        default=1,
+        help='number of processes used to run tasks (election x method)',
+    )
+    batch_parser.add_argument(
+        '--no_data_cache',
+        action='store_true',
+        dest='no_data_cache',
+        help='parse data files without using the cache (`.cache` in every data directory)',
+    )
+
+    serve_parser.add_argument(
+        '-d',
+        '--data',
+        type=str,
+        dest='data_paths',
+        action='append',
+        required=True,
+        help='path to data of an election or a glob pattern matching many of them',
+    )
+    serve_parser.add_argument(
+        '--host',
+        type=str,
+        dest='host',
+        default="127.0.0.1",
+        help='address to listen on',
+    )
+    serve_parser.add_argument(
+        '--port',
+        type=int,
+        dest='port',
+        default=8000,
+        help='port to listen on',
+    )
+    serve_parser.add_argument(
+        '--socket',
+        type=str,
+        dest='socket_path',
+        help='path to a Unix socket to listen on (instead of host and port)',
+    )
+    serve_parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        dest='jobs',
+        default=1,
+        help='number of processes used to run requests',
+    )
+    serve_parser.add_argument(
+        '--no_data_cache',
+        action='store_true',
+        dest='no_data_cache',
+        help='parse data files without using the cache (`.cache` in every data directory)',
+    )
+
+    watch_parser.add_argument(
+        '-m',
+        '--method',
+        type=str,
+        dest='methods',
+        choices=[*methods_desc.keys()] + ["all"],
+        action='append',
+        help='method to run (`all` to run all methods)',
+    )
+    watch_parser.add_argument(
+        '-mc',
+        '--metric',
+        type=str,
+        dest='metrics',
+        choices=[*metrics_unary_desc.keys(), *metrics_binary_desc.keys()] + ["all"],
+        action='append',
+        help='metric to run on methods outcomes (`all` to run all metrics)',
+    )
+    watch_parser.add_argument(
         '-d',
         '--data',
         type=str,
@@ -88,33 +434,179 @@ def cli_prepare() -> argparse.ArgumentParser:
         required=True,
         help='path to data',
     )
-    run_parser.add_argument(
-        '-r',
-        '--results',
+    watch_parser.add_argument(
+        '-o',
+        '--output',
         type=str,
-        dest='results_path',
+        dest='output_path',
         required=True,
-        help='path to a directory where results will be saved in folder in format: "YYYY-MM-DD HH:MM:SS"',
+        help='path to a JSON file where current results are saved (replaced whenever they change)',
     )
-    run_parser.add_argument(
-        '-p',
-        '--parameter',
+    add_parameters_arguments(watch_parser)
+    watch_parser.add_argument(
+        '--interval',
+        type=float,
+        dest='interval',
+        default=5,
+        help='number of seconds between checks of data files',
+    )
+    watch_parser.add_argument(
+        '--iterations',
+        type=int,
+        dest='iterations',
+        default=0,
+        help='number of checks of data files before stopping (0 to run until interrupted)',
+    )
+
+    bench_parser.add_argument(
+        '-m',
+        '--method',
         type=str,
-        dest='parameters',
+        dest='methods',
+        choices=[*methods_desc.keys()] + ["all"],
         action='append',
-        help='parameter to set (format key=value)',
+        help='method to benchmark (default: all methods)',
     )
-    run_parser.add_argument(
-        '--parameters_file',
+    bench_parser.add_argument(
+        '-mc',
+        '--metric',
         type=str,
-        dest='parameters_file',
-        help='path to a file with parameters (in json format)',
+        dest='metrics',
+        choices=[*metrics_unary_desc.keys(), *metrics_binary_desc.keys()] + ["all"],
+        action='append',
+        help='metric to benchmark (default: all metrics)',
+    )
+    bench_parser.add_argument(
+        '-d',
+        '--data',
+        type=str,
+        dest='data_paths',
+        action='append',
+        help='path to data or a glob pattern (default: `example_data/*` and a synthetic election)',
+    )
+    bench_parser.add_argument(
+        '--synthetic',
+        type=str,
+        dest='synthetic',
+        action='append',
+        help='synthetic election to benchmark (format voters=10000,projects=100,districts=5,average_approvals=5,seed=0)',
+    )
+    bench_parser.add_argument(
+        '--scaling',
+        type=str,
+        dest='scaling',
+        help='option of synthetic elections and its values to measure scaling of methods (format voters=1000,10000,100000)',
+    )
+    add_parameters_arguments(bench_parser)
+    bench_parser.add_argument(
+        '--repeat',
+        type=int,
+        dest='repeat',
+        default=3,
+        help='number of timed runs of every benchmark',
+    )
+    bench_parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        dest='output_path',
+        help='path to a JSON file where results will be saved (can be used later as a baseline)',
+    )
+    bench_parser.add_argument(
+        '--baseline',
+        type=str,
+        dest='baseline_path',
+        help='path to a JSON file with results saved earlier to compare with',
+    )
+    bench_parser.add_argument(
+        '--max_slowdown',
+        type=float,
+        dest='max_slowdown',
+        help='fail if any benchmark is slower than in the baseline by more than this factor',
+    )
+    bench_parser.add_argument(
+        '--max_import_time',
+        type=float,
+        dest='max_import_time',
+        help='fail if importing the CLI takes longer (in seconds, not checked by default)',
+    )
+
+    generate_parser.add_argument(
+        '-o',
+        '--output',
+        type=str,
+        dest='output_path',
+        required=True,
+        help='path to a directory where .pb files (and constraints.json) will be saved',
+    )
+    generate_parser.add_argument(
+        '-s',
+        '--synthetic',
+        type=str,
+        dest='synthetic',
+        default="",
+        help='options of the election (format voters=10000,projects=100,...; see `SyntheticOptions` for all options)',
     )
 
     return parser
 
+def parse_key_values(provided: List[str] | None) -> Dict[str, str]:
+    result = {}
+    for p in (provided or []):
+        splitted = p.split("=")
+        if len(splitted) != 2:
+            raise Exception(f"Invalid parameter format: {p}")
+        key, value = splitted
+        result[key] = value
+    return result
+
+def read_parameters(args: argparse.Namespace) -> Parameters:
+    provided_parameters = parse_key_values(args.parameters)
+
+    parameters_from_file: Dict[str, Dict[str, Any]] = {}
+    if args.parameters_file is not None:
+        if not os.path.isfile(args.parameters_file):
+            raise Exception(f"Parameters file does not exist: {args.parameters_file}")
+        with open(args.parameters_file, "r", encoding="utf-8") as f:
+            parameters_from_file = json.load(f)
+
+    parameters = get_default_parameters()
+    parameters.merge_with_parameters_from_cli(provided_parameters)
+    parameters.merge_with_parameters(parameters_from_file)
+    return parameters
+
+def check_data_arguments(args: argparse.Namespace) -> str | None:
+    """
+    Checks the data arguments and returns the path to the cache of data files (None if disabled).
+    """
+    data_path = args.data_path
+    if data_path is None or data_path == "":
+        raise Exception("No data path provided")
+    if not os.path.isdir(data_path):
+        raise Exception("Data path is not a directory")
+    if args.load_workers < 1:
+        raise Exception("Number of load workers must be positive")
+
+    if args.no_data_cache:
+        return None
+    return args.data_cache_path or os.path.join(data_path, ".cache")
+
+def read_outcome_cache(args: argparse.Namespace) -> "OutcomeCache | None":
+    from .outcome_cache import DEFAULT_MAX_SIZE, OutcomeCache
+
+    if args.no_outcome_cache:
+        return None
+    if args.outcome_cache_size is not None and args.outcome_cache_size < 0:
+        raise Exception("Size of the cache of outcomes must not be negative")
+    path = args.outcome_cache_path or os.path.join(args.data_path, ".cache", "outcomes")
+    max_size = DEFAULT_MAX_SIZE if args.outcome_cache_size is None else args.outcome_cache_size * 2**20
+    return OutcomeCache(path, max_size)
+
 def cli_execute(args: argparse.Namespace) -> None:
     if args.command == "run":
+        from .load_data import read_constraints
+        from .run import RunOptions
+
         # Remove duplicates
         methods = set(args.methods or [])
         metrics = set(args.metrics or [])
@@ -127,41 +619,15 @@ def cli_execute(args: argparse.Namespace) -> None:
                 if metric in binary_metrics:
                     raise Exception("Only one method selected, but used a metric that compares outcomes of two methods")
 
-        data_path = args.data_path
-        if data_path is None or data_path == "":
-            raise Exception("No data path provided")
-        if not os.path.isdir(data_path):
-            raise Exception("Data path is not a directory")
+        data_cache_path = check_data_arguments(args)
         results_path = args.results_path
         if results_path is None:
             raise Exception("No results path provided")
         if not os.path.isdir(results_path):
             raise Exception("Results path is not a directory")
 
-        provided_parameters = {}
-        for p in (args.parameters or []):
-            splitted = p.split("=")
-            if len(splitted) != 2:
-                raise Exception(f"Invalid parameter format: %s", p)
-            key, value = splitted
-            provided_parameters[key] = value
-        
-        parameters_from_file: Dict[str, Dict[str, Any]] = {}
-        if args.parameters_file is not None:
-            if not os.path.isfile(args.parameters_file):
-                raise Exception(f"Parameters file does not exist: {args.parameters_file}")
-            with open(args.parameters_file, "r", encoding="utf-8") as f:
-                parameters_from_file = json.load(f)
-
-        parameters = get_default_parameters()
-        parameters.merge_with_parameters_from_cli(provided_parameters)
-        parameters.merge_with_parameters(parameters_from_file)
-
-        constraints = None
-        constraints_path = os.path.join(data_path, "constraints.json")
-        if os.path.isfile(constraints_path):
-            with open(constraints_path, "r", encoding="utf-8") as f:
-                constraints = json.load(f)
+        parameters = read_parameters(args)
+        constraints = read_constraints(args.data_path)
  
         logger.info("Methods to run: %s", ', '.join(methods))
         if len(metrics) > 0:
@@ -181,9 +647,200 @@ def cli_execute(args: argparse.Namespace) -> None:
             methods_to_run=methods,
             metrics_to_run=metrics,
             parameters=parameters,
-            constraints=constraints
+            constraints=constraints,
+            jobs=args.jobs,
+            cprofile=args.cprofile,
+            outcome_cache=read_outcome_cache(args),
         )
-        execute_run(data_path, results_path, run_options)
+        if args.jobs < 1:
+            raise Exception("Number of jobs must be positive")
+
+        execute_run(args.data_path, results_path, run_options, args.load_workers, data_cache_path)
+    elif args.command == "sweep":
+        from .load_data import read_constraints
+        from .sweep import SweepOptions, parse_grid
+
+        methods = set(args.methods or [])
+        metrics = set(args.metrics or [])
+
+        if len(methods) == 0:
+            raise Exception("No methods selected")
+        if "all" in methods:
+            methods = set(methods_desc.keys())
+        if "all" in metrics:
+            metrics = set(metrics_unary_desc.keys())
+
+        data_cache_path = check_data_arguments(args)
+        output_dir = os.path.dirname(os.path.abspath(args.output_path))
+        if not os.path.isdir(output_dir):
+            raise Exception(f"Output directory does not exist: {output_dir}")
+        if args.jobs < 1:
+            raise Exception("Number of jobs must be positive")
+
+        parameters = read_parameters(args)
+        grid = parse_grid(parameters, parse_key_values(args.sweep))
+
+        logger.debug("With parameters: %s", parameters)
+        logger.debug("Sweeping parameters: %s", grid)
+
+        sweep_options = SweepOptions(
+            methods_to_run=methods,
+            metrics_to_run=metrics,
+            parameters=parameters,
+            constraints=read_constraints(args.data_path),
+            grid=grid,
+            jobs=args.jobs,
+            outcome_cache=read_outcome_cache(args),
+        )
+
+        execute_sweep(args.data_path, args.output_path, sweep_options, args.load_workers, data_cache_path)
+    elif args.command == "batch":
+        from .batch import BatchOptions, find_elections
+
+        methods = set(args.methods or [])
+        metrics = set(args.metrics or [])
+
+        if len(methods) == 0:
+            raise Exception("No methods selected")
+        if "all" in methods:
+            methods = set(methods_desc.keys())
+        if len(methods) == 1:
+            for metric in metrics:
+                if metric in metrics_binary_desc.keys():
+                    raise Exception("Only one method selected, but used a metric that compares outcomes of two methods")
+        if "all" in metrics:
+            if len(methods) == 1:
+                metrics = set(metrics_unary_desc.keys())
+            else:
+                metrics = set(metrics_unary_desc.keys()) | set(metrics_binary_desc.keys())
+
+        elections = find_elections(args.data_paths)
+        output_dir = os.path.dirname(os.path.abspath(args.output_path))
+        if not os.path.isdir(output_dir):
+            raise Exception(f"Output directory does not exist: {output_dir}")
+        if args.jobs < 1:
+            raise Exception("Number of jobs must be positive")
+
+        parameters = read_parameters(args)
+        logger.info("Elections: %s", ', '.join(elections))
+        logger.debug("With parameters: %s", parameters)
+
+        batch_options = BatchOptions(
+            methods_to_run=methods,
+            metrics_to_run=metrics,
+            parameters=parameters,
+            jobs=args.jobs,
+            use_data_cache=not args.no_data_cache,
+        )
+
+        execute_batch(elections, args.output_path, batch_options)
+    elif args.command == "serve":
+        from .batch import find_elections
+        from .serve import ServeOptions
+
+        elections = find_elections(args.data_paths)
+        if args.jobs < 1:
+            raise Exception("Number of jobs must be positive")
+
+        serve_options = ServeOptions(
+            host=args.host,
+            port=args.port,
+            socket_path=args.socket_path,
+            jobs=args.jobs,
+        )
+
+        execute_serve(elections, serve_options, not args.no_data_cache)
+    elif args.command == "watch":
+        from .live import LiveElection
+        from .run import RunOptions
+
+        methods = set(args.methods or [])
+        metrics = set(args.metrics or [])
+
+        if len(methods) == 0:
+            raise Exception("No methods selected")
+        if "all" in methods:
+            methods = set(methods_desc.keys())
+        if len(methods) == 1:
+            for metric in metrics:
+                if metric in metrics_binary_desc.keys():
+                    raise Exception("Only one method selected, but used a metric that compares outcomes of two methods")
+        if "all" in metrics:
+            if len(methods) == 1:
+                metrics = set(metrics_unary_desc.keys())
+            else:
+                metrics = set(metrics_unary_desc.keys()) | set(metrics_binary_desc.keys())
+
+        if not os.path.isdir(args.data_path):
+            raise Exception("Data path is not a directory")
+        if args.interval <= 0:
+            raise Exception("Interval must be positive")
+        if args.iterations < 0:
+            raise Exception("Number of iterations must not be negative")
+
+        run_options = RunOptions(
+            methods_to_run=methods,
+            metrics_to_run=metrics,
+            parameters=read_parameters(args),
+            constraints=None,
+        )
+
+        execute_watch(LiveElection(args.data_path), args.output_path, run_options, args.interval, args.iterations)
+    elif args.command == "bench":
+        from .batch import find_elections
+        from .bench import BenchOptions
+        from .synthetic import SyntheticOptions, parse_synthetic_options
+
+        methods = set(args.methods or ["all"])
+        metrics = set(args.metrics or ["all"])
+        if "all" in methods:
+            methods = set(methods_desc.keys())
+        if "all" in metrics:
+            metrics = set(metrics_unary_desc.keys()) | set(metrics_binary_desc.keys())
+
+        data_paths = args.data_paths
+        synthetic = [parse_synthetic_options(s) for s in (args.synthetic or [])]
+        if data_paths is None and len(synthetic) == 0:
+            data_paths = ["example_data/*"] if os.path.isdir("example_data") else []
+            synthetic = [SyntheticOptions()]
+        elections = find_elections(data_paths) if data_paths else []
+
+        scaling = None
+        if args.scaling is not None:
+            splitted = args.scaling.split("=")
+            if len(splitted) != 2 or splitted[0] not in SyntheticOptions.__annotations__:
+                raise Exception(f"Invalid scaling format: {args.scaling}")
+            dimension, values = splitted
+            scaling = (dimension, [SyntheticOptions.__annotations__[dimension](v) for v in values.split(",")])
+
+        if args.repeat < 1:
+            raise Exception("Number of repeats must be positive")
+        if args.max_slowdown is not None and args.baseline_path is None:
+            raise Exception("Maximal slowdown can be checked only with a baseline")
+        if args.baseline_path is not None and not os.path.isfile(args.baseline_path):
+            raise Exception(f"Baseline file does not exist: {args.baseline_path}")
+
+        bench_options = BenchOptions(
+            data_paths=elections,
+            synthetic=synthetic,
+            scaling=scaling,
+            methods_to_run=methods,
+            metrics_to_run=metrics,
+            parameters=read_parameters(args),
+            repeat=args.repeat,
+        )
+
+        execute_bench(bench_options, args.output_path, args.baseline_path, args.max_slowdown, args.max_import_time)
+    elif args.command == "generate":
+        from .synthetic import parse_synthetic_options, save_election
+
+        options = parse_synthetic_options(args.synthetic)
+        if os.path.isdir(args.output_path) and any(f.endswith('.pb') for f in os.listdir(args.output_path)):
+            raise Exception(f"Output directory already contains .pb files: {args.output_path}")
+
+        logger.info("Generating synthetic election: %s", options)
+        paths = save_election(options, args.output_path)
+        logger.info("Saved %d files to %s", len(paths), args.output_path)
     elif args.command == "methods":
         print_methods()
     elif args.command == "metrics":
@@ -0,0 +1,128 @@
+"""
+Cache of parsed data files. Columns of every .pb file are saved in a NumPy `.npz` file
+named after the hash of the file content, and `manifest.json` keeps for every data file
+its size, modification time and content hash.
+
+A cached file is used when size and modification time did not change. Otherwise the content
+hash is computed and, if it is still the same, only the manifest is updated.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .types import ColumnarGroup
+from .logger import logger
+from .instrumentation import count, timed
+
+
+CACHE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+FileColumns = Tuple[Dict[str, str], ColumnarGroup]
+
+def file_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def file_stat(path: str) -> Dict[str, int]:
+    stat = os.stat(path)
+    return { "size": stat.st_size, "mtime_ns": stat.st_mtime_ns }
+
+def save_columns(path: str, meta: Dict[str, str], columns: ColumnarGroup) -> None:
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        meta=np.array(json.dumps(meta)),
+        district_names=np.array(json.dumps(columns.district_names)),
+        project_ids=columns.project_ids,
+        costs=columns.costs,
+        voter_ids=columns.voter_ids,
+        votes_indptr=columns.votes_indptr,
+        votes=columns.votes,
+        district_codes=columns.district_codes,
+    )
+    os.replace(tmp_path, path)
+
+def read_columns(path: str) -> FileColumns:
+    with np.load(path, allow_pickle=False) as f:
+        return json.loads(str(f["meta"])), ColumnarGroup(
+            project_ids=f["project_ids"],
+            costs=f["costs"],
+            voter_ids=f["voter_ids"],
+            votes_indptr=f["votes_indptr"],
+            votes=f["votes"],
+            district_codes=f["district_codes"],
+            district_names=json.loads(str(f["district_names"])),
+        )
+
+def read_manifest(cache_path: str) -> Dict[str, Any]:
+    manifest_path = os.path.join(cache_path, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r', encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == CACHE_VERSION:
+            return manifest
+    return { "version": CACHE_VERSION, "files": {} }
+
+def write_manifest(cache_path: str, manifest: Dict[str, Any]) -> None:
+    manifest_path = os.path.join(cache_path, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", 'w', encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+@timed("load.cache")
+def load_files_columns_cached(paths: List[str], cache_path: str,
+                              load: Callable[[List[str]], List[FileColumns]]) -> List[FileColumns]:
+    """
+    Returns columns of the given files, reading them from the cache when possible.
+    Files that are not cached (or changed) are parsed with `load` and saved in the cache.
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    manifest = read_manifest(cache_path)
+    previous_files = manifest["files"]
+    files: Dict[str, Dict[str, Any]] = { k: v for k, v in previous_files.items() if os.path.isfile(k) }
+    manifest["files"] = files
+
+    results: Dict[str, FileColumns] = {}
+    to_parse: List[str] = []
+    for path in paths:
+        key = os.path.abspath(path)
+        stat = file_stat(path)
+        entry = files.get(key)
+        cache_file = os.path.join(cache_path, entry["hash"] + ".npz") if entry is not None else None
+        if entry is not None and not os.path.isfile(cache_file):
+            entry = None
+        elif entry is not None and (entry["size"], entry["mtime_ns"]) != (stat["size"], stat["mtime_ns"]):
+            if file_hash(path) == entry["hash"]:
+                entry = files[key] = { **stat, "hash": entry["hash"] }
+            else:
+                entry = None
+        if entry is None:
+            to_parse.append(path)
+        else:
+            results[path] = read_columns(cache_file)
+            count("load.files_cached")
+
+    if len(to_parse) > 0:
+        logger.debug("Parsing %d data files not found in cache", len(to_parse))
+    for path, (meta, columns) in zip(to_parse, load(to_parse)):
+        content_hash = file_hash(path)
+        save_columns(os.path.join(cache_path, content_hash + ".npz"), meta, columns)
+        files[os.path.abspath(path)] = { **file_stat(path), "hash": content_hash }
+        results[path] = (meta, columns)
+
+    # Nothing is written when all files were cached, so many processes can read the cache at once
+    if files != previous_files:
+        used_hashes = { entry["hash"] for entry in files.values() }
+        for filename in os.listdir(cache_path):
+            if filename.endswith(".npz") and filename[:-len(".npz")] not in used_hashes:
+                os.remove(os.path.join(cache_path, filename))
+        write_manifest(cache_path, manifest)
+    return [results[path] for path in paths]
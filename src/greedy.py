@@ -1,7 +1,9 @@
 import operator
 from typing import Dict, List
 
-from .types import InputDataPerGroup, ProjectsGroup
+import numpy as np
+
+from .types import InputDataPerGroup, Profile, ProjectsGroup, as_profiles_array
 from .parameters import ParametersGroup
 from .utils import fold_dict, map_dict
 
@@ -11,22 +13,37 @@ def greedy(data: Dict[str, InputDataPerGroup], _parameters: ParametersGroup) ->
 
 def greedy_for_group(data: InputDataPerGroup) -> List[int]:
     group = data.group
-    budget = data.budget
-    votes_per_project = {p.id: 0 for p in group.projects}
-
-    for profile in group.profiles:
-        for vote in profile.votes:
-            votes_per_project[vote] += 1
+    project_ids = np.array([p.id for p in group.projects], dtype=np.int64)
+    costs = np.array([p.cost for p in group.projects], dtype=np.int64)
+    return greedy_by_votes(data.budget, project_ids, costs, vote_counts(project_ids, group.profiles))
+
+def vote_counts(project_ids: np.ndarray, profiles: List[Profile]) -> np.ndarray:
+    order = np.argsort(project_ids, kind='stable')
+    votes = as_profiles_array(profiles).votes
+    positions = np.searchsorted(project_ids[order], votes)
+    positions[positions == len(order)] = 0
+    known = project_ids[order][positions] == votes if len(order) > 0 else np.zeros(len(votes), dtype=bool)
+    if not known.all():
+        raise KeyError(f"Vote for unknown project: {votes[~known][0]}")
+    return np.bincount(order[positions], minlength=len(project_ids))
+
+def greedy_by_votes(budget: int, project_ids: np.ndarray, costs: np.ndarray, votes: np.ndarray) -> List[int]:
+    """
+    Selects projects in order of decreasing number of votes (ties broken by smaller id),
+    skipping projects that no longer fit in the budget.
+    """
+    order = np.lexsort((project_ids, -votes))
+    sorted_ids, sorted_costs = project_ids[order].tolist(), costs[order]
+    # Minimum cost of the project at the given position or any later one, to stop when nothing fits
+    cheapest_remaining = np.minimum.accumulate(sorted_costs[::-1])[::-1].tolist()
 
-    projects = {p.id: p for p in group.projects}
     selected_projects = []
-    remaining_projects = set(filter(lambda p: projects[p].cost <= budget, projects.keys()))
-    while len(remaining_projects) > 0:
-        best_project = max(remaining_projects, key=lambda p: votes_per_project[projects[p].id])
-        budget -= projects[best_project].cost
-        selected_projects.append(projects[best_project].id)
-        remaining_projects.remove(best_project)
-        remaining_projects = set(filter(lambda p: projects[p].cost <= budget, remaining_projects))
+    for project, cost, cheapest in zip(sorted_ids, sorted_costs.tolist(), cheapest_remaining):
+        if cheapest > budget:
+            break
+        if cost <= budget:
+            budget -= cost
+            selected_projects.append(project)
 
     return selected_projects
 
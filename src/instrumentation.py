@@ -0,0 +1,85 @@
+"""
+Instrumentation of hot paths with named timers (number of calls, total, minimal and maximal time)
+and counters. Names start with the phase they belong to, e.g. `load.parse`, `merge`, `mes.rounds`.
+
+Values are collected in the current process. `snapshot` returns them as plain dicts, so they can be
+sent from worker processes and saved as JSON (`profile.json` in results directory).
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, TypeVar
+
+
+ProfileType = Dict[str, Dict[str, Any]]
+F = TypeVar('F', bound=Callable[..., Any])
+
+class Instrumentation:
+    # Every timer is a list: [count, total, min, max]
+    timers: Dict[str, List[float]]
+    counters: Dict[str, int]
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+
+    def reset(self) -> None:
+        self.timers = {}
+        self.counters = {}
+
+    def add_time(self, name: str, seconds: float) -> None:
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = min(timer[2], seconds)
+            timer[3] = max(timer[3], seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> ProfileType:
+        return {
+            "timers": {
+                name: { "count": int(c), "total": total, "min": low, "max": high }
+                for name, (c, total, low, high) in self.timers.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+instrumentation = Instrumentation()
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation.add_time(name, time.perf_counter() - start)
+
+def timed(name: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper # type: ignore
+    return decorator
+
+def count(name: str, n: int = 1) -> None:
+    instrumentation.count(name, n)
+
+@contextmanager
+def collect() -> Iterator[ProfileType]:
+    """
+    Collects timers and counters of the block from scratch. The yielded dict is filled when the block ends.
+    """
+    instrumentation.reset()
+    profile: ProfileType = {}
+    try:
+        yield profile
+    finally:
+        profile.update(instrumentation.snapshot())
@@ -0,0 +1,472 @@
+"""
+Incremental mode for elections that receive votes while voting is open. `LiveElection` parses a data directory once
+and then reads only rows appended to VOTES sections of its `.pb` files (`refresh`) or rows passed to `add_votes`.
+New rows update:
+- vote counts of their group and its outcome of `greedy`,
+- voter classes (distinct merged ballots with numbers of voters), from which the approval matrix of MES methods is built
+  without a pass over all voters (when no ballot is new or gone, only weights of changed ballots are updated),
+- profiles of their group and merged profiles of their voters (kept in chunks, joined when data for other methods
+  or metrics is needed), so data is never merged again.
+Other methods are run again only when their outcomes are requested and votes changed since their last run.
+
+A file that is shorter than what was already read, a new file or a removed file makes the election load again.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+
+from .types import InputDataPerGroup, Project, ProfileView, ProfilesArray, ProjectsGroup
+from .logger import logger
+from .instrumentation import collect, timer
+from .parameters import Parameters, ParametersGroup
+from .load_data import parse_file_columns, parse_votes, read_constraints
+from .results import MethodOutcome, Results, results_to_json
+from .greedy import greedy_by_votes, vote_counts
+from .mes import approval_matrix_cache
+from .mes_engine import ApprovalMatrix
+from .registry import methods_desc
+from .run import RunOptions, run_method, run_metrics
+from .utils import merged_input_data, remember
+
+
+Ballot = Tuple[int, ...]
+
+class LiveFile:
+    path: str
+    group: str
+    # Columns of the VOTES section
+    header: List[str]
+    # Number of bytes already read (up to the end of the last complete line)
+    offset: int
+
+    def __init__(self, path: str, group: str, header: List[str], offset: int):
+        self.path = path
+        self.group = group
+        self.header = header
+        self.offset = offset
+
+class ProfilesChunks:
+    """
+    Profiles appended in chunks (with districts coded by common `district_names`).
+    """
+    chunks: List[ProfilesArray]
+    district_names: List[str]
+
+    def __init__(self):
+        self.chunks = []
+        self.district_names = []
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks)
+
+    def append(self, profiles: ProfilesArray) -> None:
+        codes = np.array([*(self.district_code(name) for name in profiles.district_names), -1], dtype=np.int64)
+        self.chunks.append(ProfilesArray(profiles.voter_ids, profiles.votes_indptr, profiles.votes,
+                                         codes[profiles.district_codes], self.district_names))
+
+    def district_code(self, name: str) -> int:
+        if name not in self.district_names:
+            self.district_names.append(name)
+        return self.district_names.index(name)
+
+    def joined(self) -> ProfilesArray:
+        """
+        Profiles of all chunks, joined into one chunk.
+        """
+        if len(self.chunks) != 1:
+            empty = np.zeros(0, dtype=np.int64)
+            offsets = np.cumsum([0, *(len(c.votes) for c in self.chunks[:-1])], dtype=np.int64)
+            self.chunks = [ProfilesArray(
+                np.concatenate([empty, *(c.voter_ids for c in self.chunks)]),
+                np.concatenate([np.zeros(1, dtype=np.int64),
+                                *(c.votes_indptr[1:] + offset for c, offset in zip(self.chunks, offsets))]),
+                np.concatenate([empty, *(c.votes for c in self.chunks)]),
+                np.concatenate([empty, *(c.district_codes for c in self.chunks)]),
+                self.district_names,
+            )]
+        return self.chunks[0]
+
+class LiveGroup:
+    projects: List[Project]
+    project_ids: np.ndarray
+    costs: np.ndarray
+    budget: int
+    constraint: int | None
+    profiles_chunks: ProfilesChunks
+    counts: np.ndarray
+    greedy: List[int]
+
+    def __init__(self, projects: List[Project], budget: int, constraint: int | None):
+        self.projects = projects
+        self.project_ids = np.array([p.id for p in projects], dtype=np.int64)
+        self.costs = np.array([p.cost for p in projects], dtype=np.int64)
+        self.budget = budget
+        self.constraint = constraint
+        self.profiles_chunks = ProfilesChunks()
+        self.counts = np.zeros(len(projects), dtype=np.int64)
+        self.greedy = greedy_by_votes(budget, self.project_ids, self.costs, self.counts)
+
+    def add(self, profiles: ProfilesArray) -> None:
+        # Vote counts are computed first, so profiles with votes for unknown projects are not added
+        counts = vote_counts(self.project_ids, profiles)
+        self.profiles_chunks.append(profiles)
+        self.counts += counts
+        self.greedy = greedy_by_votes(self.budget, self.project_ids, self.costs, self.counts)
+
+    def profiles(self) -> ProfilesArray:
+        return self.profiles_chunks.joined()
+
+class LiveElection:
+    path: str
+    files: List[LiveFile]
+    groups: Dict[str, LiveGroup]
+    # Merged ballot of every voter and the number of voters with every nonempty ballot
+    ballots: Dict[int, Ballot]
+    weights: Dict[Ballot, int]
+    # Position of the first group with a profile of every voter and the district of the voter in it
+    districts: Dict[int, Tuple[int, str | None]]
+    # Merged profiles (as in `get_merged_input_data`) kept up to date with votes: when the merged ballot or district
+    # of a voter changes, a new row is appended and the previous one is dropped
+    merged: ProfilesChunks
+    merged_rows: Dict[int, int]
+    dropped_rows: List[int]
+    # Increased whenever votes change
+    version: int
+    # The last built approval matrix (for votes of `matrix_version`) with the voter class of every ballot in it
+    matrix: ApprovalMatrix | None
+    matrix_version: int
+    matrix_classes: Dict[Ballot, int]
+    # Whether a ballot was added to voter classes or removed from them since the last built matrix
+    classes_changed: bool
+    # Ballots whose numbers of voters changed since the last built matrix
+    changed_weights: Set[Ballot]
+    data_cache: Tuple[int, Dict[str, InputDataPerGroup]] | None
+    # Version of votes, parameters and outcome of the last run of every method
+    outcomes_cache: Dict[str, Tuple[int, Dict[str, Any], MethodOutcome]]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.load()
+
+    def load(self) -> None:
+        logger.info("Loading %s...", self.path)
+        constraints = read_constraints(self.path) or {}
+        self.files = []
+        self.groups = {}
+        self.ballots = {}
+        self.weights = {}
+        self.districts = {}
+        self.merged = ProfilesChunks()
+        self.merged_rows = {}
+        self.dropped_rows = []
+        self.version = 0
+        self.matrix = None
+        self.matrix_version = -1
+        self.matrix_classes = {}
+        self.classes_changed = True
+        self.changed_weights = set()
+        self.data_cache = None
+        self.outcomes_cache = {}
+
+        citywide: Tuple[LiveFile, LiveGroup, ProfilesArray] | None = None
+        districts: List[Tuple[LiveFile, LiveGroup, ProfilesArray]] = []
+        for path in self.data_files():
+            with open(path, 'rb') as f:
+                content = f.read()
+            offset = content.rfind(b'\n') + 1
+            # Line endings are translated as in files opened in text mode by `load_data` (pabulib files often use CRLF)
+            text = content[:offset].decode("utf-8").replace('\r\n', '\n')
+            meta, columns = parse_file_columns(text)
+            votes_start = text.index('\nVOTES\n') + len('\nVOTES\n')
+            header = text[votes_start:text.index('\n', votes_start)].split(';')
+            name = meta.get('subunit', 'citywide')
+            loaded = (LiveFile(path, name, header, offset),
+                      LiveGroup(columns.projects(), int(meta['budget']), constraints.get(name)),
+                      columns.profiles())
+            if 'subunit' in meta:
+                districts.append(loaded)
+            elif citywide is not None:
+                raise Exception('Multiple citywide files found')
+            else:
+                citywide = loaded
+        if citywide is None:
+            raise Exception('No citywide file found')
+
+        # Groups are in the same order as in `load_data`
+        for file, group, profiles in [*districts, citywide]:
+            self.files.append(file)
+            self.groups[file.group] = group
+        for file, group, profiles in [*districts, citywide]:
+            self.ingest(file.group, profiles)
+        # Rows of voters of more groups are dropped once, instead of whenever merged profiles are needed
+        self.merged.chunks = [self.merged_profiles()]
+        self.merged_rows = { voter: row for row, voter in enumerate(self.merged.chunks[0].voter_ids.tolist()) }
+        self.dropped_rows = []
+
+    def data_files(self) -> List[str]:
+        return [os.path.join(self.path, f) for f in sorted(os.listdir(self.path)) if f.endswith('.pb')]
+
+    def number_of_voters(self) -> int:
+        return len(self.ballots)
+
+    def number_of_rows(self) -> int:
+        return sum(len(group.profiles_chunks) for group in self.groups.values())
+
+    def refresh(self) -> int:
+        """
+        Reads rows appended to data files since the last refresh and returns their number.
+        """
+        if sorted(f.path for f in self.files) != self.data_files() \
+           or any(os.path.getsize(f.path) < f.offset for f in self.files):
+            logger.info("Data files of %s changed, loading them again", self.path)
+            self.load()
+            return self.number_of_rows()
+
+        rows = 0
+        for file in self.files:
+            if os.path.getsize(file.path) == file.offset:
+                continue
+            with open(file.path, 'rb') as f:
+                f.seek(file.offset)
+                content = f.read()
+            end = content.rfind(b'\n') + 1
+            lines = [line for line in content[:end].decode("utf-8").splitlines() if line != ""]
+            if len(lines) > 0:
+                self.ingest(file.group, ProfilesArray(*parse_votes(file.header, lines)))
+            file.offset += end
+            rows += len(lines)
+        return rows
+
+    def add_votes(self, group: str, voter_ids: List[int], ballots: List[List[int]],
+                  districts: List[str | None] | None = None) -> None:
+        """
+        Adds votes (as if appended to the data file of the group).
+        """
+        if group not in self.groups:
+            raise ValueError(f"Unknown group: {group}")
+        if len(ballots) != len(voter_ids) or (districts is not None and len(districts) != len(voter_ids)):
+            raise ValueError("Numbers of voters, ballots and districts differ")
+        self.ingest(group, ProfilesArray.from_profiles([
+            ProfileView(_id, votes, districts[i] if districts is not None else None) # type: ignore
+            for i, (_id, votes) in enumerate(zip(voter_ids, ballots))
+        ]))
+
+    def ingest(self, group: str, profiles: ProfilesArray) -> None:
+        with timer("live.ingest"):
+            self.groups[group].add(profiles)
+            position = list(self.groups.keys()).index(group)
+            district_names = [*profiles.district_names, None]
+            codes = profiles.district_codes.tolist()
+            votes = profiles.votes.tolist()
+            indptr = profiles.votes_indptr.tolist()
+            changed: List[int] = []
+            for i, voter in enumerate(profiles.voter_ids.tolist()):
+                previous_district = self.districts.get(voter)
+                if previous_district is None or position < previous_district[0]:
+                    self.districts[voter] = (position, district_names[codes[i]])
+                previous = self.ballots.get(voter)
+                ballot = tuple(sorted(set(previous or ()).union(votes[indptr[i]:indptr[i + 1]])))
+                self.ballots[voter] = ballot
+                if ballot != previous or self.districts[voter] != previous_district:
+                    changed.append(voter)
+                if ballot == previous:
+                    continue
+                self.changed_weights.add(ballot)
+                if previous is not None and len(previous) > 0:
+                    self.changed_weights.add(previous)
+                    self.weights[previous] -= 1
+                    if self.weights[previous] == 0:
+                        del self.weights[previous]
+                        self.classes_changed = True
+                if len(ballot) > 0:
+                    if ballot not in self.weights:
+                        self.weights[ballot] = 0
+                        self.classes_changed = self.classes_changed or ballot not in self.matrix_classes
+                    self.weights[ballot] += 1
+            self.update_merged(changed)
+        self.version += 1
+
+    def update_merged(self, voters: List[int]) -> None:
+        """
+        Appends rows of merged profiles of voters whose ballot or district changed.
+        """
+        if len(voters) == 0:
+            return
+        row = len(self.merged)
+        for voter in voters:
+            if voter in self.merged_rows:
+                self.dropped_rows.append(self.merged_rows[voter])
+            self.merged_rows[voter] = row
+            row += 1
+        ballots = [self.ballots[voter] for voter in voters]
+        votes_indptr = np.zeros(len(voters) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in ballots], out=votes_indptr[1:])
+        codes: Dict[str, int] = {}
+        district_codes = np.array([
+            codes.setdefault(district, len(codes)) if district is not None else -1
+            for district in (self.districts[voter][1] for voter in voters)
+        ], dtype=np.int64)
+        self.merged.append(ProfilesArray(
+            np.array(voters, dtype=np.int64),
+            votes_indptr,
+            np.fromiter((v for b in ballots for v in b), dtype=np.int64, count=int(votes_indptr[-1])),
+            district_codes,
+            list(codes.keys()),
+        ))
+
+    def merged_profiles(self) -> ProfilesArray:
+        """
+        Profiles of `get_merged_input_data` for votes read so far (votes of a voter are sorted by project id).
+        """
+        profiles = self.merged.joined()
+        if len(self.dropped_rows) == 0:
+            return profiles
+        keep = np.ones(len(profiles), dtype=bool)
+        keep[self.dropped_rows] = False
+        sizes = profiles.ballot_sizes()
+        votes_indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        np.cumsum(sizes[keep], out=votes_indptr[1:])
+        return ProfilesArray(profiles.voter_ids[keep], votes_indptr, profiles.votes[np.repeat(keep, sizes)],
+                             profiles.district_codes[keep], profiles.district_names)
+
+    def approval_matrix(self) -> ApprovalMatrix:
+        """
+        Approval matrix of all projects, built from voter classes instead of voters.
+        """
+        if self.matrix is not None and self.matrix_version == self.version:
+            return self.matrix
+        self.matrix_version = self.version
+        with timer("live.matrix"):
+            previous = self.matrix
+            changed_weights, self.changed_weights = self.changed_weights, set()
+            if not self.classes_changed and previous is not None:
+                weights = previous.weights.copy()
+                for ballot in changed_weights:
+                    if len(ballot) > 0:
+                        weights[self.matrix_classes[ballot]] = self.weights.get(ballot, 0)
+                self.matrix = ApprovalMatrix(previous.project_ids, previous.costs, previous.supporters_indptr,
+                                             previous.supporters, weights, self.number_of_voters())
+                return self.matrix
+
+            projects = [p for g in self.groups.values() for p in g.projects]
+            ballots = list(self.weights.keys())
+            sizes = np.fromiter((len(b) for b in ballots), dtype=np.int64, count=len(ballots))
+            self.matrix = ApprovalMatrix.from_votes(
+                np.array([p.id for p in projects], dtype=np.int64),
+                np.array([p.cost for p in projects], dtype=np.int64),
+                np.repeat(np.arange(len(ballots), dtype=np.int64), sizes),
+                np.fromiter((v for b in ballots for v in b), dtype=np.int64, count=int(sizes.sum())),
+                self.number_of_voters(),
+                np.fromiter(self.weights.values(), dtype=np.int64, count=len(ballots)),
+            )
+            self.matrix_classes = class_ballots(self.matrix)
+            self.classes_changed = False
+            return self.matrix
+
+    def data(self) -> Dict[str, InputDataPerGroup]:
+        """
+        Data of the election with all votes read so far. Its merged data and the approval matrix of MES methods
+        are already in caches of `get_merged_input_data` and `get_approval_matrix`, so they are not built from profiles.
+        """
+        if self.data_cache is not None and self.data_cache[0] == self.version:
+            return self.data_cache[1]
+        data = {
+            name: InputDataPerGroup.model_construct(
+                group=ProjectsGroup.model_construct(projects=group.projects, profiles=group.profiles()),
+                budget=group.budget,
+                constraint=group.constraint,
+            )
+            for name, group in self.groups.items()
+        }
+        merged = InputDataPerGroup.model_construct(
+            group=ProjectsGroup.model_construct(projects=[p for g in self.groups.values() for p in g.projects],
+                                                profiles=self.merged_profiles()),
+            budget=sum(g.budget for g in self.groups.values()),
+            constraint=None,
+        )
+        remember(merged_input_data, (data, merged))
+        remember(approval_matrix_cache, (merged.group.profiles, [(p.id, p.cost) for p in merged.group.projects],
+                                         self.approval_matrix()))
+        self.data_cache = (self.version, data)
+        return data
+
+    def outcomes(self, methods_to_run: List[str], parameters: Parameters) -> Dict[str, MethodOutcome]:
+        """
+        Outcomes of methods for votes read so far. `greedy` is kept up to date with votes,
+        other methods are run only if votes or their parameters changed since their last run.
+        """
+        outcomes: Dict[str, MethodOutcome] = {}
+        for name in methods_to_run:
+            parameters_group = parameters[name] if name in parameters else ParametersGroup()
+            if name == "greedy":
+                start = time.time()
+                selected = [p for g in self.groups.values() for p in g.greedy]
+                outcomes[name] = MethodOutcome(selected_projects=selected, time=time.time() - start)
+                continue
+            cached = self.outcomes_cache.get(name)
+            if cached is not None and cached[0] == self.version and cached[1] == parameters_group.to_dict():
+                outcomes[name] = cached[2]
+                continue
+            logger.info("Running method %s...", name)
+            outcomes[name] = run_method(self.data(), name, parameters_group)
+            self.outcomes_cache[name] = (self.version, parameters_group.to_dict(), outcomes[name])
+        return outcomes
+
+    def results(self, run_options: RunOptions) -> Results:
+        with collect() as prepare_profile:
+            self.data()
+        outcomes = self.outcomes([m for m in methods_desc.keys() if m in run_options.methods_to_run], run_options.parameters)
+        with collect() as metrics_profile:
+            metrics_scores, metrics_results_for_group = run_metrics(self.data(), outcomes, run_options)
+        profile = {
+            "prepare": prepare_profile,
+            "methods": { name: outcome.profile for name, outcome in outcomes.items() },
+            "metrics": metrics_profile,
+        }
+        return Results(outcomes=outcomes, metrics_scores=metrics_scores, district_results=metrics_results_for_group,
+                       profile=profile)
+
+def class_ballots(matrix: ApprovalMatrix) -> Dict[Ballot, int]:
+    """
+    Voter class of the matrix for every ballot (sorted ids of approved projects).
+    """
+    rows = np.repeat(np.arange(len(matrix.project_ids), dtype=np.int64), np.diff(matrix.supporters_indptr))
+    order = np.lexsort((matrix.project_ids[rows], matrix.supporters))
+    classes, ids = matrix.supporters[order], matrix.project_ids[rows][order]
+    starts = np.searchsorted(classes, np.arange(matrix.number_of_classes() + 1))
+    ids_list = ids.tolist()
+    return { tuple(ids_list[starts[c]:starts[c + 1]]): c for c in range(matrix.number_of_classes()) }
+
+def save_live_results(live: LiveElection, results: Results, output_path: str) -> None:
+    with open(output_path + ".tmp", 'w', encoding="utf-8") as f:
+        json.dump({
+            "version": live.version,
+            "voters": live.number_of_voters(),
+            "methods_outcomes": { name: outcome.selected_projects for name, outcome in results.outcomes.items() },
+            **results_to_json(results),
+        }, f, indent=4)
+    # Readers (e.g. dashboards) never see a partially written file
+    os.replace(output_path + ".tmp", output_path)
+
+def watch(live: LiveElection, run_options: RunOptions, output_path: str, interval: float, iterations: int = 0) -> None:
+    """
+    Reads new votes every `interval` seconds and saves results whenever they changed.
+    Stops after `iterations` checks (never, if 0).
+    """
+    iteration = 0
+    rows = live.number_of_rows()
+    while True:
+        if rows > 0 or iteration == 0:
+            start = time.perf_counter()
+            save_live_results(live, live.results(run_options), output_path)
+            logger.info("%d new rows, %d voters, results updated in %.2f s", rows, live.number_of_voters(),
+                        time.perf_counter() - start)
+        iteration += 1
+        if iteration == iterations:
+            break
+        time.sleep(interval)
+        rows = live.refresh()
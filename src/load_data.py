@@ -1,55 +1,171 @@
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Dict, List, Tuple
 
-from .types import InputDataPerGroup, Profile, Project, ProjectsGroup
+import numpy as np
 
+from .types import ColumnarGroup, ConstraintsType, InputDataPerGroup, ProjectsGroup
+from .data_cache import load_files_columns_cached
+from .instrumentation import count, timed
+
+
+DISTRICT_COLUMNS = ["district", "neighborhood"]
+
+def split_sections(content: str) -> Tuple[List[str], List[str], List[str]]:
+    meta_start = content.index('META\n')
+    projects_start = content.index('\nPROJECTS\n') + 1
+    votes_start = content.index('\nVOTES\n') + 1
+    # The first line of every section is its name and the second one is a header
+    return content[meta_start:projects_start].splitlines()[2:], \
+           content[projects_start:votes_start].splitlines()[1:], \
+           content[votes_start:].splitlines()[1:]
+
+def parse_votes(header: List[str], lines: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    id_column = header.index('voter_id')
+    votes_column = header.index('vote')
+    district_column = next((header.index(c) for c in DISTRICT_COLUMNS if c in header), None)
+
+    rows = list(map(str.split, lines, repeat(';')))
+    voter_ids = np.array([row[id_column] for row in rows], dtype=np.int64)
+
+    ballots = [row[votes_column] for row in rows]
+    ballot_sizes = np.fromiter(map(str.count, ballots, repeat(',')), dtype=np.int64, count=len(ballots)) \
+                   + np.fromiter(map(bool, ballots), dtype=bool, count=len(ballots))
+    votes_indptr = np.zeros(len(ballots) + 1, dtype=np.int64)
+    np.cumsum(ballot_sizes, out=votes_indptr[1:])
+    votes = np.fromstring(','.join(b for b in ballots if b), dtype=np.int64, sep=',') \
+            if votes_indptr[-1] > 0 else np.zeros(0, dtype=np.int64)
+
+    district_names: List[str] = []
+    district_codes = np.full(len(rows), -1, dtype=np.int64)
+    if district_column is not None:
+        codes: Dict[str, int] = {}
+        district_codes = np.fromiter(
+            (codes.setdefault(row[district_column], len(codes)) if len(row) > district_column else -1 for row in rows),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        district_names = list(codes.keys())
+
+    return voter_ids, votes_indptr, votes, district_codes, district_names
+
+def load_file_columns(path: str) -> Tuple[Dict[str, str], ColumnarGroup]:
+    with open(path, 'r', encoding="utf-8") as f:
+        content = f.read()
+    return parse_file_columns(content)
+
+def parse_file_columns(content: str) -> Tuple[Dict[str, str], ColumnarGroup]:
+    meta_lines, projects_lines, votes_lines = split_sections(content)
+
+    meta: Dict[str, str] = {}
+    for line in meta_lines:
+        key, value = line.split(';', 1)
+        meta[key] = value
+
+    projects_header = projects_lines[0].split(';')
+    id_column, cost_column = projects_header.index('project_id'), projects_header.index('cost')
+    projects_rows = [line.split(';') for line in projects_lines[1:]]
+    project_ids = np.array([row[id_column] for row in projects_rows], dtype=np.int64)
+    costs = np.array([row[cost_column] for row in projects_rows], dtype=np.int64)
+
+    voter_ids, votes_indptr, votes, district_codes, district_names = \
+        parse_votes(votes_lines[0].split(';'), votes_lines[1:])
+
+    return meta, ColumnarGroup(project_ids, costs, voter_ids, votes_indptr, votes, district_codes, district_names)
 
 def load_file(path: str) -> Tuple[Dict[str, str], ProjectsGroup]:
-    with open(path, 'r') as f:
-        meta: Dict[str, str] = {}
-        assert f.readline() == 'META\n'
-        line = f.readline()
-        line = f.readline()
-        while line != 'PROJECTS\n':
-            key, value = line[:-1].split(';')
-            meta[key] = value
-            line = f.readline()
-        projects = []
-        line = f.readline()
-        line = f.readline()
-        while line != 'VOTES\n':
-            _id, cost, _, _, _, _, _, _, _ = line[:-1].split(';')
-            # longitude=float(longitude) if longitude else None
-            # latitude=float(latitude) if latitude else None
-            projects.append(Project(_id=int(_id), cost=int(cost)))
-            line = f.readline()
-        profiles = []
-        line = f.readline()
-        line = f.readline()
-        while line:
-            # _id, age, sex, voting_method, votes_str, district = line[:-1].split(';')
-            values = line[:-1].split(';')
-            votes: List[int] = [int(vote) for vote in values[4].split(',')] if values[4] != "" else []
-            # age = int(values[1]) if values[1] else None
-            district = values[5] if len(values) == 6 else None
-            profiles.append(Profile(_id=int(values[0]), votes=votes, district=district))
-            line = f.readline()
-    return meta, ProjectsGroup(projects=projects, profiles=profiles)
-
-def load_data(path: str) -> Dict[str, InputDataPerGroup]:
-    districts: Dict[str, InputDataPerGroup] = {}
-    citywide: InputDataPerGroup | None = None
-
-    for filename in os.listdir(path):
-        if filename.endswith('.pb'):
-            meta, projects_group = load_file(os.path.join(path, filename))
-            if 'subunit' in meta:
-                districts[meta['subunit']] = InputDataPerGroup(group=projects_group, budget=int(meta['budget']), constraint=None)
-            else:
-                if citywide is not None:
-                    raise Exception('Multiple citywide files found')
-                citywide = InputDataPerGroup(group=projects_group, budget=int(meta['budget']), constraint=None)
+    meta, columns = load_file_columns(path)
+    return meta, columns.projects_group()
+
+@timed("load.parse")
+def load_files_columns(paths: List[str], workers: int = 1) -> List[Tuple[Dict[str, str], ColumnarGroup]]:
+    if workers <= 1 or len(paths) <= 1:
+        return [load_file_columns(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return list(executor.map(load_file_columns, paths))
+
+def load_data_columns(path: str, workers: int = 1, cache_path: str | None = None) -> Dict[str, Tuple[Dict[str, str], ColumnarGroup]]:
+    """
+    Loads all .pb files from the directory without creating pydantic models.
+    Files are parsed in `workers` processes and merged in the order of their names.
+    If `cache_path` is given, parsed files are read from and saved to this directory.
+    Returns metadata and columns of every district and of the citywide file (under `citywide` key).
+    """
+    districts: Dict[str, Tuple[Dict[str, str], ColumnarGroup]] = {}
+    citywide: Tuple[Dict[str, str], ColumnarGroup] | None = None
+
+    paths = [os.path.join(path, filename) for filename in sorted(os.listdir(path)) if filename.endswith('.pb')]
+    count("load.files", len(paths))
+    if cache_path is not None:
+        loaded = load_files_columns_cached(paths, cache_path, lambda p: load_files_columns(p, workers))
+    else:
+        loaded = load_files_columns(paths, workers)
+    for meta, columns in loaded:
+        if 'subunit' in meta:
+            districts[meta['subunit']] = (meta, columns)
+        else:
+            if citywide is not None:
+                raise Exception('Multiple citywide files found')
+            citywide = (meta, columns)
 
     if citywide is None:
         raise Exception('No citywide file found')
-    return districts | { 'citywide': citywide }
\ No newline at end of file
+    return districts | { 'citywide': citywide }
+
+def load_data(path: str, workers: int = 1, cache_path: str | None = None) -> Dict[str, InputDataPerGroup]:
+    loaded = load_data_columns(path, workers, cache_path)
+    return {
+        name: InputDataPerGroup(group=build_projects_group(columns), budget=int(meta['budget']), constraint=None)
+        for name, (meta, columns) in loaded.items()
+    }
+
+@timed("load.models")
+def build_projects_group(columns: ColumnarGroup) -> ProjectsGroup:
+    return columns.projects_group()
+
+def read_constraints(path: str) -> ConstraintsType:
+    constraints = None
+    constraints_path = os.path.join(path, "constraints.json")
+    if os.path.isfile(constraints_path):
+        with open(constraints_path, "r", encoding="utf-8") as f:
+            constraints = json.load(f)
+    return constraints
+
+def load_input_data(path: str, constraints: ConstraintsType, workers: int = 1,
+                    cache_path: str | None = None) -> Dict[str, InputDataPerGroup]:
+    data = load_data(path, workers, cache_path)
+
+    if constraints is not None:
+        for group, constraint in constraints.items():
+            if group not in data:
+                raise Exception(f"Group {group} is not in data")
+            data[group].constraint = constraint
+
+    return data
+
+def save_file_columns(path: str, meta: Dict[str, str], columns: ColumnarGroup) -> None:
+    """
+    Writes a .pb file with the given metadata, projects and votes (other columns of projects and voters
+    are filled with placeholder values). Districts of voters are saved in `neighborhood` column, if provided.
+    """
+    votes = columns.votes.astype(str).tolist()
+    indptr = columns.votes_indptr.tolist()
+    with_districts = bool(np.any(columns.district_codes >= 0))
+    districts = [*columns.district_names, '']
+
+    with open(path, 'w', encoding="utf-8") as f:
+        f.write('META\nkey;value\n')
+        f.writelines(f'{key};{value}\n' for key, value in meta.items())
+        f.write('PROJECTS\nproject_id;cost;name;category;target;votes;selected;longitude;latitude\n')
+        f.writelines(
+            f'{_id};{cost};{i};1;1;0;False;0.0;0.0\n'
+            for i, (_id, cost) in enumerate(zip(columns.project_ids.tolist(), columns.costs.tolist()))
+        )
+        f.write('VOTES\nvoter_id;age;sex;voting_method;vote' + (';neighborhood\n' if with_districts else '\n'))
+        f.writelines(
+            f'{_id};20;M;internet;{",".join(votes[indptr[i]:indptr[i + 1]])}'
+            + (f';{districts[code]}\n' if with_districts else '\n')
+            for i, (_id, code) in enumerate(zip(columns.voter_ids.tolist(), columns.district_codes.tolist()))
+        )
@@ -1,39 +1,57 @@
 from copy import deepcopy
 import operator
-from typing import Dict, List, Collection
-from pabutools.election import Instance, Project as PabulibProject, ApprovalProfile, \
-                               ApprovalBallot, SatisfactionMeasure, AbstractBallot,  \
-                               AbstractProfile
-from pabutools.rules import method_of_equal_shares
-from pabutools.utils import Numeric
+from typing import Dict, List, Tuple
+import numpy as np
 
 from .types import InputDataPerGroup, Profile, Project
-from .parameters import ParametersGroup, register_parameter
+from .parameters import ParametersGroup
+from .instrumentation import count, timer
+from .greedy import vote_counts
+from .mes_engine import ARITHMETICS, ApprovalMatrix, equal_shares, equal_shares_add_one, equal_shares_with_discounts, \
+                        lower_bounds_priority
 from .utils import can_afford, fold_dict, get_budgets, get_groups, get_projects_from_list, \
-                   map_dict, merge_project_groups, zip_dict
+                   get_merged_input_data, map_dict, recall, remember, zip_dict
 
 
-class MySatisfactionMeasure(SatisfactionMeasure):
-    def __init__(
-        self,
-        instance: Instance,
-        profile: AbstractProfile,
-        ballot: AbstractBallot,
-    ) -> None:
-        SatisfactionMeasure.__init__(self, instance, profile, ballot)
+MES_ENGINES = ["numpy", "pabutools"]
 
-    def _get_project_sat(self, project: Project) -> Numeric:
-        return int(project in self.ballot) * project.cost
+def check_engine(engine: str) -> None:
+    if engine not in MES_ENGINES:
+        raise ValueError(f"Unknown MES engine: {engine} (available: {', '.join(MES_ENGINES)})")
 
-    def sat(self, projects: Collection[Project]) -> Numeric:
-        return sum(self._get_project_sat(p) for p in projects)
+def check_arithmetic(arithmetic: str) -> None:
+    if arithmetic not in ARITHMETICS:
+        raise ValueError(f"Unknown arithmetic: {arithmetic} (available: {', '.join(ARITHMETICS)})")
 
-    def sat_project(self, project: Project) -> Numeric:
-        return self._get_project_sat(project)
+def check_step(step: float) -> None:
+    if step <= 0:
+        raise ValueError(f"Step must be positive: {step}")
+
+# The last built approval matrices, shared by methods (and configurations of a sweep) run on the same data
+approval_matrix_cache: List[Tuple[List[Profile], List[Tuple[int, int]], ApprovalMatrix]] = []
+
+def get_approval_matrix(projects: List[Project], profiles: List[Profile]) -> ApprovalMatrix:
+    key = [(p.id, p.cost) for p in projects]
+    entry = recall(approval_matrix_cache, lambda e: e[0] is profiles and e[1] == key)
+    if entry is None:
+        entry = remember(approval_matrix_cache, (profiles, key, ApprovalMatrix.from_profiles(projects, profiles)))
+    return entry[2]
+
+def prepare_data(data: Dict[str, InputDataPerGroup]) -> None:
+    """
+    Merges data and builds the approval matrix of all projects, so they are in caches shared by methods
+    and are not part of the time of the first method run on `data`.
+    """
+    with timer("prepare.merge"):
+        profiles = get_merged_input_data(data).group.profiles
+    with timer("prepare.approval_matrix"):
+        projects: List[Project] = fold_dict(lambda x, d: x + d.group.projects, [], data)
+        get_approval_matrix(projects, profiles)
 
-register_parameter("modified_mes", "step", float, 0.1)
-register_parameter("modified_mes", "part_of_initial_budget", float, 0.8)
 def modified_mes(data: Dict[str, InputDataPerGroup], parameters: ParametersGroup) -> List[int]:
+    check_engine(parameters["engine"])
+    check_arithmetic(parameters["arithmetic"])
+    check_step(parameters["step"])
     groups, budgets = get_groups(data), get_budgets(data)
     budget = int(fold_dict(operator.add, 0, budgets) * parameters["part_of_initial_budget"])
     all_projects: List[Project] = fold_dict(lambda x, g: x + g.projects, [], groups)
@@ -42,7 +60,14 @@ def modified_mes(data: Dict[str, InputDataPerGroup], parameters: ParametersGroup
     discount_steps['citywide'] = 0 # TODO: ?
 
     projects_dict = { p.id: p for p in all_projects }
-    profiles = merge_project_groups(groups).profiles
+    profiles = get_merged_input_data(data).group.profiles
+
+    if parameters["engine"] == "numpy":
+        discounts: List[float] = fold_dict(lambda x, g: x + [g[1]] * len(g[0].projects),
+                                           [],
+                                           zip_dict(groups, discount_steps))
+        return equal_shares_with_discounts(get_approval_matrix(all_projects, profiles), budget,
+                                           discounts, parameters["search"], parameters["arithmetic"])
 
     def discounted(p: Project, discount: float, iteration: int) -> Project:
         new_p = deepcopy(p)
@@ -53,56 +78,88 @@ def modified_mes(data: Dict[str, InputDataPerGroup], parameters: ParametersGroup
     iteration = 0
     while True:
         iteration += 1
+        count("modified_mes.iterations")
 
         projects: List[Project] = fold_dict(lambda x, g: x + list(map(lambda p: discounted(p, g[1], iteration), g[0].projects)),
                                             [],
                                             zip_dict(groups, discount_steps))
 
-        chosen_ids = modified_mes_one_step(budget, projects, profiles)
+        chosen_ids = modified_mes_one_step(budget, projects, profiles, parameters["engine"])
         chosen_projects = get_projects_from_list(projects_dict, chosen_ids)
 
         if not can_afford(budget, chosen_projects):
             return previously_chosen
         previously_chosen = chosen_ids
 
-def modified_mes_one_step(budget: int, projects: List[Project], profiles: List[Profile]) -> List[int]:
-    projects_dict = { p.id: PabulibProject(str(p.id), p.cost) for p in projects }
-    instance = Instance(projects_dict.values(), budget)
-    profile = ApprovalProfile([
-            ApprovalBallot([projects_dict[v] for v in p.votes])
-            for p in profiles
-        ]) #.as_multiprofile() # TODO: check if this helps
+def modified_mes_one_step(budget: int, projects: List[Project], profiles: List[Profile], engine: str = "numpy") -> List[int]:
+    if engine == "numpy":
+        matrix = ApprovalMatrix.from_profiles(projects, profiles)
+        return matrix.ids(equal_shares(matrix, budget / matrix.number_of_voters))
 
-    outcome = method_of_equal_shares(
-        instance,
-        profile,
-        sat_class=MySatisfactionMeasure,
-    )
+    from .mes_pabutools import pabutools_equal_shares # pabutools is slow to import, so only when used
+    return pabutools_equal_shares(budget, projects, profiles)
 
-    return [int(p.name) for p in outcome]
-
-register_parameter("mes_add_one", "step", int, 20)
 def mes(data: Dict[str, InputDataPerGroup], parameters: ParametersGroup) -> List[int]:
+    check_engine(parameters["engine"])
+    check_arithmetic(parameters["arithmetic"])
+    check_step(parameters["step"])
     groups, budgets = get_groups(data), get_budgets(data)
     budget = fold_dict(operator.add, 0, budgets)
     projects: List[Project] = fold_dict(lambda x, g: x + g.projects, [], groups)
-    profiles = merge_project_groups(groups).profiles
+    profiles = get_merged_input_data(data).group.profiles
 
     return mes_folded(budget, projects, profiles, parameters)
 
 def mes_folded(budget: int, projects: List[Project], profiles: List[Profile], parameters: ParametersGroup) -> List[int]:
-    projects_dict = { p.id: PabulibProject(str(p.id), p.cost) for p in projects }
-    instance = Instance(projects_dict.values(), budget)
-    profile = ApprovalProfile([
-            ApprovalBallot([projects_dict[v] for v in p.votes])
-            for p in profiles
-        ]) #.as_multiprofile() # TODO: check if this helps
-
-    outcome = method_of_equal_shares(
-        instance,
-        profile,
-        sat_class=MySatisfactionMeasure,
-        voter_budget_increment=parameters["step"],
-    )
-
-    return [int(p.name) for p in outcome]
+    if parameters["engine"] == "numpy":
+        return equal_shares_add_one(get_approval_matrix(projects, profiles), budget,
+                                    parameters["step"], parameters["search"], parameters["arithmetic"])
+
+    from .mes_pabutools import pabutools_equal_shares # pabutools is slow to import, so only when used
+    return pabutools_equal_shares(budget, projects, profiles, parameters["step"])
+
+def mes_constrained(data: Dict[str, InputDataPerGroup], parameters: ParametersGroup) -> List[int]:
+    """
+    Method of Equal Shares (AddOne) on all groups, where only projects of groups whose lower bound constraint
+    is not met yet are selected (as long as any of them fits in the budget), so the budget is not spent
+    on other groups first. Groups still below their lower bounds are then completed greedily.
+    Without constraints it is the same as `mes_add_one`.
+    """
+    check_arithmetic(parameters["arithmetic"])
+    check_step(parameters["step"])
+    groups, budgets = get_groups(data), get_budgets(data)
+    budget = fold_dict(operator.add, 0, budgets)
+    projects: List[Project] = fold_dict(lambda x, g: x + g.projects, [], groups)
+    profiles = get_merged_input_data(data).group.profiles
+
+    matrix = get_approval_matrix(projects, profiles)
+    # Rows of the matrix are in the order of projects, so they are grouped by groups
+    row_groups = np.repeat(np.arange(len(groups)), [len(g.projects) for g in groups.values()])
+    lower_bounds = np.array([d.constraint or 0 for d in data.values()], dtype=np.int64)
+    selected = equal_shares_add_one(matrix, budget, parameters["step"], parameters["search"], parameters["arithmetic"],
+                                    lower_bounds_priority(matrix, row_groups, lower_bounds, budget))
+    return complete_lower_bounds(data, budget, selected)
+
+def complete_lower_bounds(data: Dict[str, InputDataPerGroup], budget: int, selected: List[int]) -> List[int]:
+    """
+    Adds projects of groups below their lower bound constraints (in order of decreasing number of votes
+    in the group, as in `greedy`) until the constraints are met, skipping projects that do not fit in the budget.
+    """
+    result = list(selected)
+    chosen = set(selected)
+    remaining = budget - sum(p.cost for d in data.values() for p in d.group.projects if p.id in chosen)
+    for d in data.values():
+        if d.constraint is None:
+            continue
+        spent = sum(p.cost for p in d.group.projects if p.id in chosen)
+        project_ids = np.array([p.id for p in d.group.projects], dtype=np.int64)
+        costs = np.array([p.cost for p in d.group.projects], dtype=np.int64)
+        votes = vote_counts(project_ids, d.group.profiles)
+        for i in np.lexsort((project_ids, -votes)).tolist():
+            if spent >= d.constraint:
+                break
+            if int(project_ids[i]) not in chosen and costs[i] <= remaining:
+                result.append(int(project_ids[i]))
+                spent += int(costs[i])
+                remaining -= int(costs[i])
+    return result
@@ -0,0 +1,518 @@
+"""
+NumPy implementation of the Method of Equal Shares with cost satisfaction.
+
+It follows the same rules as `pabutools.rules.method_of_equal_shares` used with
+`MySatisfactionMeasure` (satisfaction of a supporter is equal to the cost of the project):
+- only projects with positive cost and at least one supporter take part,
+- in each round the project with the lowest affordability is selected,
+- ties are broken lexicographically on the project id converted to a string.
+
+Approvals are kept as a CSR matrix (project -> supporters), so the affordability of
+many projects is computed at once with segmented NumPy operations.
+
+Voters with identical ballots always have the same budget (they start with the same one
+and pay the same for every selected project), so they are collapsed into a single weighted
+voter class when the matrix is built. The outcome is the same as with one row per voter,
+but the work of every round depends on the number of distinct ballots.
+
+Budgets can be kept in floating point numbers (`float`, compared with a relative tolerance),
+in integer cents (`fixed`, payments are rounded up to a cent and affordability is compared exactly,
+so outcomes do not depend on the platform) or in exact rational numbers (`exact`, a slow pure Python
+implementation meant for small instances). `verify` runs the exact implementation and reports
+when outcomes of the other two differ from it.
+"""
+
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+from .types import Profile, Project, as_profiles_array
+from .logger import logger
+from .instrumentation import count, timed
+
+
+# Relative tolerance used when comparing floating point values that are equal in exact arithmetic
+TOLERANCE = 1e-9
+# Budgets are scaled to cents in fixed point arithmetic
+FIXED_POINT_SCALE = 100
+ARITHMETICS = ["float", "fixed", "exact", "verify"]
+
+# Returns a mask of prioritized projects, given the rows selected so far
+Priority = Callable[[List[int]], np.ndarray]
+
+class ApprovalMatrix:
+    """
+    Approval ballots in CSR format: supporting voter classes of the project in row `r` are
+    `supporters[supporters_indptr[r]:supporters_indptr[r + 1]]`. A voter class stands for
+    `weights[c]` voters with the same ballot. `number_of_voters` counts all voters,
+    including voters without approvals (who belong to no class).
+    """
+    project_ids: np.ndarray
+    costs: np.ndarray
+    supporters_indptr: np.ndarray
+    supporters: np.ndarray
+    weights: np.ndarray
+    number_of_voters: int
+    tie_breaking_rank: np.ndarray
+
+    def __init__(self, project_ids: np.ndarray, costs: np.ndarray, supporters_indptr: np.ndarray,
+                 supporters: np.ndarray, weights: np.ndarray, number_of_voters: int):
+        self.project_ids = project_ids
+        self.costs = costs
+        self.supporters_indptr = supporters_indptr
+        self.supporters = supporters
+        self.weights = weights
+        self.number_of_voters = number_of_voters
+
+        names = np.array([str(p) for p in project_ids.tolist()])
+        self.tie_breaking_rank = np.empty(len(project_ids), dtype=np.int64)
+        self.tie_breaking_rank[np.argsort(names, kind='stable')] = np.arange(len(project_ids))
+
+    @staticmethod
+    @timed("mes.build_matrix")
+    def from_profiles(projects: List[Project], profiles: List[Profile]) -> 'ApprovalMatrix':
+        project_ids = np.array([p.id for p in projects], dtype=np.int64)
+        costs = np.array([p.cost for p in projects], dtype=np.int64)
+        ballots = as_profiles_array(profiles)
+        voters = np.repeat(np.arange(len(ballots), dtype=np.int64), ballots.ballot_sizes())
+        return ApprovalMatrix.from_votes(project_ids, costs, voters, ballots.votes, len(ballots))
+
+    @staticmethod
+    def from_votes(project_ids: np.ndarray, costs: np.ndarray, voters: np.ndarray, votes: np.ndarray,
+                   number_of_voters: int, voter_weights: np.ndarray | None = None) -> 'ApprovalMatrix':
+        """
+        Builds the matrix from pairs (voter index, project id). Repeated pairs are counted once
+        and voters with identical ballots are collapsed into voter classes. With `voter_weights`, the voter `i`
+        stands for `voter_weights[i]` voters (e.g. a class of voters kept by `live`) and `number_of_voters` counts
+        all of them.
+        """
+        order = np.argsort(project_ids, kind='stable')
+        sorted_ids = project_ids[order]
+        positions = np.searchsorted(sorted_ids, votes)
+        positions[positions == len(sorted_ids)] = 0
+        if len(votes) > 0 and not np.array_equal(sorted_ids[positions], votes):
+            unknown = votes[sorted_ids[positions] != votes][0]
+            raise KeyError(f"Vote for unknown project: {unknown}")
+        rows = order[positions]
+
+        number_of_ballots = len(voter_weights) if voter_weights is not None else number_of_voters
+        voters, rows, weights = voter_classes(voters, rows, number_of_ballots, len(project_ids), voter_weights)
+        number_of_classes = len(weights)
+        count("mes.voters", number_of_voters)
+        count("mes.voter_classes", number_of_classes)
+        logger.debug("Approval matrix: %d voters in %d voter classes (compression ratio %.2f)",
+                     number_of_voters, number_of_classes, number_of_voters / max(number_of_classes, 1))
+
+        pairs = np.unique(rows * max(number_of_classes, 1) + voters)
+        rows, supporters = np.divmod(pairs, max(number_of_classes, 1))
+        indptr = np.zeros(len(project_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(project_ids)), out=indptr[1:])
+
+        return ApprovalMatrix(project_ids, costs, indptr, supporters, weights, number_of_voters)
+
+    def number_of_classes(self) -> int:
+        return len(self.weights)
+
+    def compression_ratio(self) -> float:
+        """
+        Number of voters per voter class, i.e. how many times the problem is smaller than with a row per voter.
+        """
+        return self.number_of_voters / max(self.number_of_classes(), 1)
+
+    def supporters_count(self) -> np.ndarray:
+        """
+        Number of voters (not voter classes) supporting every project.
+        """
+        counts = np.zeros(len(self.project_ids), dtype=np.int64)
+        nonempty = np.flatnonzero(np.diff(self.supporters_indptr) > 0)
+        if len(nonempty) > 0:
+            counts[nonempty] = np.add.reduceat(self.weights[self.supporters], self.supporters_indptr[nonempty])
+        return counts
+
+    def ids(self, rows: Sequence[int]) -> List[int]:
+        return [int(i) for i in self.project_ids[np.asarray(rows, dtype=np.int64)]]
+
+
+def voter_classes(voters: np.ndarray, rows: np.ndarray, number_of_voters: int, number_of_projects: int,
+                  voter_weights: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Groups voters by their sets of approved rows. Returns pairs (voter class, row)
+    and the number of voters in every class (the sum of `voter_weights` of its voters, if given).
+
+    Ballots are grouped by a random 64-bit hash of their rows, and every voter is then compared
+    with the first voter of its group, so the grouping is exact even if two ballots collide.
+    """
+    pairs = np.unique(voters * max(number_of_projects, 1) + rows)
+    voters, rows = np.divmod(pairs, max(number_of_projects, 1))
+    sizes = np.bincount(voters, minlength=number_of_voters)
+    indptr = np.zeros(number_of_voters + 1, dtype=np.int64)
+    np.cumsum(sizes, out=indptr[1:])
+    # Voters without approvals never pay, so they belong to no class
+    nonempty = np.flatnonzero(sizes > 0)
+
+    keys = np.random.default_rng(0).integers(0, np.iinfo(np.int64).max, number_of_projects, dtype=np.uint64)
+    hashes = np.add.reduceat(keys[rows], indptr[nonempty]) if len(nonempty) > 0 else np.zeros(0, dtype=np.uint64)
+    _, first, classes = np.unique(np.stack([hashes, sizes[nonempty].astype(np.uint64)], axis=1), axis=0,
+                                  return_index=True, return_inverse=True)
+    classes = classes.reshape(-1)
+
+    representatives = nonempty[first[classes]]
+    own, _ = gather_rows(indptr, nonempty)
+    theirs, _ = gather_rows(indptr, representatives)
+    if not np.array_equal(rows[own], rows[theirs]):
+        # Hash collision: group ballots by their exact contents
+        ballots: Dict[bytes, int] = {}
+        classes = np.array([ballots.setdefault(rows[indptr[v]:indptr[v + 1]].tobytes(), len(ballots))
+                            for v in nonempty.tolist()], dtype=np.int64)
+        first = np.unique(classes, return_index=True)[1]
+
+    is_first = np.zeros(len(nonempty), dtype=bool)
+    is_first[first] = True
+    of_voter = np.full(number_of_voters, -1, dtype=np.int64)
+    of_voter[nonempty] = classes
+    kept = is_first[np.searchsorted(nonempty, voters)]
+    weights = np.bincount(classes, weights=voter_weights[nonempty] if voter_weights is not None else None,
+                          minlength=len(first)).astype(np.int64)
+    return of_voter[voters[kept]], rows[kept], weights
+
+def gather_rows(indptr: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of all entries of the given CSR rows (concatenated) and offsets of each row in the result.
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    positions = np.arange(offsets[-1], dtype=np.int64) + np.repeat(starts - offsets[:-1], lengths)
+    return positions, offsets
+
+def payment_caps(matrix: ApprovalMatrix, budgets: np.ndarray, costs: np.ndarray,
+                 rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    For every project in `rows` (each with some supporters) computes the smallest `t` such that supporters paying
+    `min(budget, t)` cover the cost of the project.
+    Returns `t` and a mask of projects whose supporters can afford them at all.
+    If budgets are integers, `t` is rounded up to an integer.
+
+    Budgets are not sorted: `t` starts from an equal share of the cost, and supporters poorer than `t`
+    pay their whole budgets, which raises `t` for the rest. A few passes find all poorer supporters.
+    """
+    integer = np.issubdtype(budgets.dtype, np.integer)
+    positions, offsets = gather_rows(matrix.supporters_indptr, rows)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    supporters = matrix.supporters[positions]
+    supporters_budgets = budgets[supporters]
+    weights = matrix.weights[supporters].astype(budgets.dtype)
+    paid = weights * supporters_budgets
+    project_costs = costs[rows].astype(budgets.dtype)
+
+    totals = np.add.reduceat(paid, starts)
+    affordable = totals >= project_costs if integer else totals >= project_costs * (1 - TOLERANCE)
+
+    # Budgets and numbers of voters of supporters poorer than the cap
+    paid_by_poorer = np.zeros(len(rows), dtype=budgets.dtype)
+    remaining_supporters = np.add.reduceat(weights, starts)
+    poorer = np.zeros(len(supporters), dtype=bool)
+    while True:
+        divisor = np.maximum(remaining_supporters, 1)
+        caps = -((paid_by_poorer - project_costs) // divisor) if integer else (project_costs - paid_by_poorer) / divisor
+        new = ~poorer & (supporters_budgets < np.repeat(caps, lengths))
+        if not np.any(new):
+            # All supporters pay their whole budgets (within the tolerance of affordability, or not enough)
+            everyone = remaining_supporters == 0
+            caps[everyone] = np.maximum.reduceat(supporters_budgets, starts)[everyone]
+            return caps, affordable
+        poorer |= new
+        paid_by_poorer += np.add.reduceat(np.where(new, paid, 0), starts)
+        remaining_supporters -= np.add.reduceat(np.where(new, weights, 0), starts)
+
+@timed("mes.equal_shares")
+def equal_shares(matrix: ApprovalMatrix, budget_per_voter: float, costs: np.ndarray | None = None,
+                 budget_limit: float | None = None, fixed_point: bool = False,
+                 priority: Priority | None = None) -> List[int]:
+    """
+    Runs a single Method of Equal Shares and returns selected rows in the order of selection.
+    If `budget_limit` is given, the run stops as soon as the selected projects
+    (with costs from `matrix`, not from `costs`) exceed it.
+    With `fixed_point`, `budget_per_voter` and `costs` must be integers (see `run_equal_shares`).
+    If `priority` is given, in every round only the projects it returns are considered (other projects
+    are considered only when it returns none of the remaining projects; if none of the returned ones is affordable,
+    the run stops).
+    """
+    count("mes.runs")
+    if costs is None:
+        costs = matrix.costs
+    # Budget of a single voter of every class
+    budgets = np.full(matrix.number_of_classes(), budget_per_voter, dtype=np.int64 if fixed_point else np.float64)
+
+    supporters_count = matrix.supporters_count()
+    active = (costs > 0) & (supporters_count > 0)
+    # Affordability of a project can only grow, so the last computed value is a lower bound
+    affordability = np.zeros(len(costs), dtype=np.float64)
+    affordability[active] = 1 / supporters_count[active]
+
+    def evaluate(scope: np.ndarray) -> tuple[float, Dict[int, float]]:
+        """
+        The lowest affordability of projects in `scope` and caps of projects that may have it.
+        """
+        candidates = np.flatnonzero(scope)
+        candidates = candidates[np.argsort(affordability[candidates], kind='stable')]
+
+        best = np.inf
+        best_caps = {}
+        position, batch = 0, 16
+        while position < len(candidates) and affordability[candidates[position]] <= best * (1 + TOLERANCE):
+            rows = candidates[position:position + batch]
+            position, batch = position + batch, batch * 2
+
+            caps, affordable = payment_caps(matrix, budgets, costs, rows)
+            count("mes.evaluated_projects", len(rows))
+            active[rows[~affordable]] = False
+            rows, caps = rows[affordable], caps[affordable]
+            if len(rows) == 0:
+                continue
+            affordability[rows] = caps / costs[rows]
+            best = min(best, float(affordability[rows].min()))
+            best_caps.update(zip(rows.tolist(), caps.tolist()))
+        return best, best_caps
+
+    selected: List[int] = []
+    selected_cost = 0
+    while True:
+        scope = active
+        if priority is not None:
+            preferred = active & priority(selected)
+            if np.any(preferred):
+                scope = preferred
+        best, best_caps = evaluate(scope)
+        if best == np.inf:
+            return selected
+
+        tied = np.flatnonzero(scope & active & (affordability <= best * (1 + TOLERANCE)))
+        if fixed_point:
+            # Caps and costs are integers, so affordability of close projects is compared exactly
+            exact = { r: Fraction(best_caps[r], int(costs[r])) for r in tied.tolist() }
+            lowest = min(exact.values())
+            tied = np.array([r for r, a in exact.items() if a == lowest], dtype=np.int64)
+        chosen = int(tied[np.argmin(matrix.tie_breaking_rank[tied])])
+        supporters = matrix.supporters[matrix.supporters_indptr[chosen]:matrix.supporters_indptr[chosen + 1]]
+        budgets[supporters] -= np.minimum(budgets[supporters], best_caps[chosen])
+        active[chosen] = False
+        selected.append(chosen)
+        count("mes.rounds")
+
+        selected_cost += int(matrix.costs[chosen])
+        if budget_limit is not None and selected_cost > budget_limit:
+            return selected
+
+def equal_shares_exact(matrix: ApprovalMatrix, budget_per_voter: Fraction, costs: np.ndarray | None = None,
+                       budget_limit: float | None = None, priority: Priority | None = None) -> List[int]:
+    """
+    The same as `equal_shares`, but in exact rational arithmetic (without any tolerance).
+    Every project is evaluated in every round in pure Python, so it is meant for small instances.
+    """
+    from gmpy2 import mpq
+
+    count("mes.runs")
+    if costs is None:
+        costs = matrix.costs
+    budgets = [mpq(budget_per_voter.numerator, budget_per_voter.denominator)] * matrix.number_of_classes()
+    weights: List[int] = matrix.weights.tolist()
+    rank: List[int] = matrix.tie_breaking_rank.tolist()
+    indptr: List[int] = matrix.supporters_indptr.tolist()
+    supporters: List[List[int]] = [matrix.supporters[indptr[r]:indptr[r + 1]].tolist() for r in range(len(costs))]
+    active = [r for r in range(len(costs)) if costs[r] > 0 and len(supporters[r]) > 0]
+
+    def evaluate(scope: List[int]) -> tuple[int, Any]:
+        """
+        The project in `scope` with the lowest affordability (or -1) and its cap.
+        """
+        chosen, best, best_cap = -1, mpq(0), mpq(0)
+        for r in scope:
+            cost = int(costs[r])
+            paid, remaining = mpq(0), sum(weights[c] for c in supporters[r])
+            cap = None
+            for c in sorted(supporters[r], key=budgets.__getitem__):
+                # Poorer supporters pay their whole budgets and the rest pay equal shares
+                if (cost - paid) / remaining <= budgets[c]:
+                    cap = (cost - paid) / remaining
+                    break
+                paid += weights[c] * budgets[c]
+                remaining -= weights[c]
+            if cap is None:
+                active.remove(r)
+                continue
+            count("mes.evaluated_projects")
+            if chosen == -1 or cap / cost < best or (cap / cost == best and rank[r] < rank[chosen]):
+                chosen, best, best_cap = r, cap / cost, cap
+        return chosen, best_cap
+
+    selected: List[int] = []
+    selected_cost = 0
+    while True:
+        scope = list(active)
+        if priority is not None:
+            preferred = priority(selected)
+            scope = [r for r in active if preferred[r]] or scope
+        chosen, best_cap = evaluate(scope)
+        if chosen == -1:
+            return selected
+        for c in supporters[chosen]:
+            budgets[c] -= min(budgets[c], best_cap)
+        active.remove(chosen)
+        selected.append(chosen)
+        count("mes.rounds")
+
+        selected_cost += int(matrix.costs[chosen])
+        if budget_limit is not None and selected_cost > budget_limit:
+            return selected
+
+def lower_bounds_priority(matrix: ApprovalMatrix, groups: np.ndarray, lower_bounds: np.ndarray, budget: int) -> Priority:
+    """
+    Priority of not selected projects (that fit in the rest of `budget`) of groups (`groups[r]` is the group
+    of the project in row `r`) in which the selected projects cost less than the lower bound of the group.
+    Projects of other groups are not selected as long as any of these groups can still reach its lower bound.
+    """
+    candidates = (matrix.costs > 0) & (matrix.supporters_count() > 0)
+
+    def priority(selected: List[int]) -> np.ndarray:
+        spent = np.bincount(groups[selected], weights=matrix.costs[selected], minlength=len(lower_bounds))
+        preferred = candidates & (spent < lower_bounds)[groups] & (matrix.costs <= budget - spent.sum())
+        preferred[selected] = False
+        return preferred
+    return priority
+
+def run_equal_shares(matrix: ApprovalMatrix, arithmetic: str, budget: int, increment: float = 0,
+                     costs: np.ndarray | None = None, budget_limit: float | None = None,
+                     priority: Priority | None = None) -> List[int]:
+    """
+    Runs a single Method of Equal Shares in which `budget` is split equally between voters
+    and every voter gets `increment` more. See `ARITHMETICS` for available arithmetics.
+    In fixed point arithmetic budgets are rounded down and costs are scaled to cents.
+    """
+    if costs is None:
+        costs = matrix.costs
+    if arithmetic == "float":
+        return equal_shares(matrix, budget / matrix.number_of_voters + increment, costs, budget_limit,
+                            priority=priority)
+    if arithmetic == "fixed":
+        budget_per_voter = budget * FIXED_POINT_SCALE // matrix.number_of_voters + round(increment * FIXED_POINT_SCALE)
+        return equal_shares(matrix, budget_per_voter, costs.astype(np.int64) * FIXED_POINT_SCALE, budget_limit,
+                            fixed_point=True, priority=priority)
+    if arithmetic == "exact":
+        return equal_shares_exact(matrix, Fraction(budget, matrix.number_of_voters) + Fraction(increment),
+                                  costs, budget_limit, priority)
+    if arithmetic == "verify":
+        exact = run_equal_shares(matrix, "exact", budget, increment, costs, budget_limit, priority)
+        for other in ["float", "fixed"]:
+            outcome = run_equal_shares(matrix, other, budget, increment, costs, budget_limit, priority)
+            if outcome != exact:
+                count("mes.verify_mismatches")
+                logger.warning("MES in %s arithmetic differs from exact arithmetic (budget %d, increment %s): %s instead of %s",
+                               other, budget, increment, matrix.ids(outcome), matrix.ids(exact))
+        return exact
+    raise ValueError(f"Unknown arithmetic: {arithmetic} (available: {', '.join(ARITHMETICS)})")
+
+def is_exhaustive(matrix: ApprovalMatrix, budget: int, selected: List[int]) -> bool:
+    available = (matrix.costs > 0) & (matrix.supporters_count() > 0)
+    available[selected] = False
+    total_cost = int(matrix.costs[selected].sum())
+    return not np.any(matrix.costs[available] + total_cost <= budget)
+
+def find_stop(should_stop: Callable[[int], bool], first: int, search: str, limit: int | None = None) -> int:
+    """
+    Finds the first iteration (starting from `first`) for which `should_stop` is true,
+    or `limit` if there is no such iteration before it.
+
+    With `search="galloping"` iterations are probed by doubling and then bisecting
+    instead of trying all of them one by one. The result is the same as with `search="linear"`
+    only when `should_stop` does not change back to false for later iterations, which is not checked
+    (it would take as many iterations as `linear`), so `linear` is the default of all methods.
+    """
+    def stop(iteration: int) -> bool:
+        return iteration == limit or should_stop(iteration)
+
+    if search == "linear":
+        iteration = first
+        while not stop(iteration):
+            iteration += 1
+        return iteration
+    if search == "galloping":
+        # Invariant: stop(low) is false (or low == first - 1), stop(high) is true
+        low, high = first - 1, first
+        while not stop(high):
+            low, high = high, first + 2 * (high - first) + 1
+            if limit is not None:
+                high = min(high, limit)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if stop(middle):
+                high = middle
+            else:
+                low = middle
+        return high
+    raise ValueError(f"Unknown search: {search}")
+
+def equal_shares_add_one(matrix: ApprovalMatrix, budget: int, step: float, search: str = "linear",
+                         arithmetic: str = "float", priority: Priority | None = None) -> List[int]:
+    """
+    Method of Equal Shares completed with AddOne: the budget of every voter is increased by `step`
+    until the outcome is exhaustive or no longer feasible. Returns selected project ids.
+    """
+    if step <= 0:
+        raise ValueError(f"Step must be positive: {step}")
+    outcomes: Dict[int, List[int]] = {}
+
+    def run(iteration: int) -> List[int]:
+        if iteration not in outcomes:
+            count("mes_add_one.iterations")
+            outcomes[iteration] = run_equal_shares(matrix, arithmetic, budget, iteration * step, budget_limit=budget,
+                                                   priority=priority)
+        return outcomes[iteration]
+
+    def is_feasible(iteration: int) -> bool:
+        return int(matrix.costs[run(iteration)].sum()) <= budget
+
+    last = find_stop(lambda i: not is_feasible(i) or is_exhaustive(matrix, budget, run(i)), 0, search)
+
+    if is_feasible(last):
+        return matrix.ids(run(last))
+    return matrix.ids(run(last - 1)) if last > 0 else []
+
+def equal_shares_with_discounts(matrix: ApprovalMatrix, budget: int, discounts: Sequence[float],
+                                search: str = "linear", arithmetic: str = "float") -> List[int]:
+    """
+    In iteration `k` (starting from 1) the cost of every project is lowered to
+    `int(cost * (1 - discount * k))` and the Method of Equal Shares is run with these costs.
+    Returns the outcome of the last iteration before the selected projects (with their real costs)
+    exceed the budget. Returns selected project ids.
+
+    With `search="linear"` (the default of `modified_mes`) all iterations up to that one are run, up to
+    `ceil(1 / discount) + 1` of them, so the number of iterations is not reduced (only each of them is cheaper than
+    with `pabutools`). `search="galloping"` runs far fewer, but may return a later iteration (see `find_stop`).
+    """
+    outcomes: Dict[int, List[int]] = {}
+    costs = matrix.costs.astype(np.float64)
+    discounts = np.asarray(discounts, dtype=np.float64)
+
+    def run(iteration: int) -> List[int]:
+        if iteration not in outcomes:
+            count("modified_mes.iterations")
+            discounted = (costs * (1 - discounts * iteration)).astype(np.int64)
+            outcomes[iteration] = run_equal_shares(matrix, arithmetic, budget, costs=discounted, budget_limit=budget)
+        return outcomes[iteration]
+
+    def is_feasible(iteration: int) -> bool:
+        return int(matrix.costs[run(iteration)].sum()) <= budget
+
+    # Projects with non-positive discounted cost are skipped, so once it happens to every
+    # discounted project, outcomes no longer change
+    positive = discounts[discounts > 0]
+    limit = int(np.ceil(1 / positive.min())) + 1 if len(positive) > 0 else 1
+
+    last = find_stop(lambda i: not is_feasible(i), 1, search, limit)
+
+    if is_feasible(last):
+        return matrix.ids(run(last))
+    return matrix.ids(run(last - 1)) if last > 1 else []
@@ -0,0 +1,60 @@
+"""
+Method of Equal Shares computed with `pabutools` (`engine=pabutools` parameter of MES methods).
+It is imported only when this engine is used, because importing `pabutools` is slow.
+"""
+
+from typing import Collection, List
+from pabutools.election import Instance, Project as PabulibProject, ApprovalProfile, \
+                               ApprovalBallot, SatisfactionMeasure, AbstractBallot,  \
+                               AbstractProfile
+from pabutools.rules import method_of_equal_shares
+from pabutools.utils import Numeric
+
+from .types import Profile, Project
+from .instrumentation import timer
+
+
+class MySatisfactionMeasure(SatisfactionMeasure):
+    def __init__(
+        self,
+        instance: Instance,
+        profile: AbstractProfile,
+        ballot: AbstractBallot,
+    ) -> None:
+        SatisfactionMeasure.__init__(self, instance, profile, ballot)
+
+    def _get_project_sat(self, project: Project) -> Numeric:
+        return int(project in self.ballot) * project.cost
+
+    def sat(self, projects: Collection[Project]) -> Numeric:
+        return sum(self._get_project_sat(p) for p in projects)
+
+    def sat_project(self, project: Project) -> Numeric:
+        return self._get_project_sat(project)
+
+def pabutools_equal_shares(budget: int, projects: List[Project], profiles: List[Profile],
+                           voter_budget_increment: int | None = None) -> List[int]:
+    with timer("mes.build_instance"):
+        projects_dict = { p.id: PabulibProject(str(p.id), p.cost) for p in projects }
+        instance = Instance(projects_dict.values(), budget)
+        profile = ApprovalProfile([
+                ApprovalBallot([projects_dict[v] for v in p.votes])
+                for p in profiles
+            ]) # .as_multiprofile() makes pabutools slower, the NumPy engine collapses identical ballots itself
+
+    with timer("mes.pabutools"):
+        if voter_budget_increment is None:
+            outcome = method_of_equal_shares(
+                instance,
+                profile,
+                sat_class=MySatisfactionMeasure,
+            )
+        else:
+            outcome = method_of_equal_shares(
+                instance,
+                profile,
+                sat_class=MySatisfactionMeasure,
+                voter_budget_increment=voter_budget_increment,
+            )
+
+    return [int(p.name) for p in outcome]
@@ -5,8 +5,9 @@ from .types import InputDataPerGroup
 from .parameters import ParametersGroup
 from .utils import can_afford, fold_dict, get_all_projects_dict, get_projects_from_list, \
                    get_budgets, get_groups
-from .mes import modified_mes, mes
+from .mes import mes_constrained, modified_mes, mes
 from .greedy import greedy
+from .registry import methods_desc
 
 
 MethodType = Callable[[Dict[str, InputDataPerGroup], ParametersGroup], List[int]]
@@ -21,15 +22,11 @@ def method_decorator(func: MethodType) -> MethodType:
         return result
     return wrapper
 
-methods_desc: Dict[str, str] = {
-    "greedy": "Greedy algorithm",
-    "mes_add_one": "Method of Equal Shares (AddOne)",
-    "modified_mes": "Modified Method of Equal Shares", # TODO: add description
-}
 methods: Dict[str, MethodType] = {
     "greedy": method_decorator(greedy),
     "mes_add_one": method_decorator(mes),
     "modified_mes": method_decorator(modified_mes),
+    "mes_constrained": method_decorator(mes_constrained),
 }
 assert set(methods.keys()) == set(methods_desc.keys())
 
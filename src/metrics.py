@@ -1,7 +1,8 @@
 from typing import Callable, Dict, List, Tuple
 
 from .types import InputDataPerGroup
-from .utils import merge_input_data
+from .utils import get_merged_input_data
+from .registry import metrics_unary_desc, metrics_binary_desc
 
 
 MetricResultType = float | int
@@ -11,7 +12,7 @@ MetricsScores = Dict[str, MetricScores]
 
 def metric_for_merged_data(metric):
     def wrapper(data: Dict[str, InputDataPerGroup], *args) -> MetricResultType:
-        return metric(merge_input_data(data), *args)
+        return metric(get_merged_input_data(data), *args)
     return wrapper
 
 def metric_from_only_for_group(metric):
@@ -37,6 +38,16 @@ def better_than(data: InputDataPerGroup, selected_projects: List[int], worse_pro
             prefers_selected += 1
     return prefers_selected / len(data.group.profiles)
 
+def equally_good(data: InputDataPerGroup, selected_projects: List[int], other_projects: List[int]) -> float:
+    selected_projects_set = set(selected_projects)
+    other_projects_set = set(other_projects)
+    equally_satisfied = 0
+    for profile in data.group.profiles:
+        votes = set(profile.votes)
+        if len(votes & selected_projects_set) == len(votes & other_projects_set):
+            equally_satisfied += 1
+    return equally_satisfied / len(data.group.profiles)
+
 def cost(data: InputDataPerGroup, selected_projects: List[int]) -> int:
     selected_projects_set = set(selected_projects)
     return sum(p.cost for p in data.group.projects if p.id in selected_projects_set)
@@ -58,13 +69,6 @@ MetricUnaryType = Callable[[Dict[str, InputDataPerGroup], List[int]], MetricResu
 MetricBinaryForGroupType = Callable[[InputDataPerGroup, List[int], List[int]], MetricResultType]
 MetricBinaryType = Callable[[Dict[str, InputDataPerGroup], List[int], List[int]], MetricResultType]
 
-metrics_unary_desc: Dict[str, str] = {
-    "average_satisfaction": "Average satisfaction (number of selected projects that are also in the profile)",
-    "cost": "Total cost of selected projects",
-    "budget_usage": "Total cost of selected projects divided by budget",
-    "number_of_selected_projects": "Number of selected projects",
-    "lower_constraint_satisfaction": "Total cost of selected projects divided by constraint",
-}
 metrics_unary: Dict[str, Tuple[MetricUnaryType | None, MetricUnaryForGroupType | None]] = {
     "average_satisfaction": metric_from_only_for_group(average_satisfaction),
     "cost": metric_from_only_for_group(cost),
@@ -72,11 +76,9 @@ metrics_unary: Dict[str, Tuple[MetricUnaryType | None, MetricUnaryForGroupType |
     "number_of_selected_projects": metric_from_only_for_group(number_of_selected_projects),
     "lower_constraint_satisfaction": (None, lower_constraint_satisfaction),
 }
-metrics_binary_desc: Dict[str, str] = {
-    "better_than": "Percentage of profiles that prefer projects selected by the first method over projects selected by the second method",
-}
 metrics_binary: Dict[str, Tuple[MetricBinaryType | None, MetricBinaryForGroupType | None]] = {
     "better_than": metric_from_only_for_group(better_than),
+    "equally_good": metric_from_only_for_group(equally_good),
 }
 
 assert set(metrics_unary.keys()) == set(metrics_unary_desc.keys())
@@ -0,0 +1,204 @@
+"""
+Vectorized computation of metrics. Approvals of every group (and of all groups merged,
+where votes of a voter from all groups are joined) are stored once as voter-major CSR matrices
+over a common index of all projects. Outcomes of all methods are stored as columns of
+a 0/1 selection matrix, so satisfaction of every voter with every method is a single
+sparse matrix product.
+
+Binary metrics compare all pairs of outcomes at once: voters with the same satisfaction with every outcome
+are counted together, and every pair is compared once (results of the pair (j, i) mirror those of (i, j)).
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .types import InputDataPerGroup, Profile, as_profiles_array
+from .metrics import MetricResultType
+from .utils import get_groups, get_voter_registry
+
+
+class ApprovalScope:
+    """
+    Voters of a group (or of all groups merged): approved projects of the voter `i` are
+    `projects[indptr[i]:indptr[i + 1]]` (indices in `MetricsEngine.project_ids`).
+    """
+    indptr: np.ndarray
+    projects: np.ndarray
+    number_of_voters: int
+    projects_mask: np.ndarray
+    budget: int
+    constraint: int | None
+    # The last comparison of outcomes with the satisfaction matrix it was computed for
+    _comparison: Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray]] | None
+
+    def __init__(self, indptr: np.ndarray, projects: np.ndarray, projects_mask: np.ndarray,
+                 budget: int, constraint: int | None):
+        self.indptr = indptr
+        self.projects = projects
+        self.number_of_voters = len(indptr) - 1
+        self.projects_mask = projects_mask
+        self.budget = budget
+        self.constraint = constraint
+        self._comparison = None
+
+    @staticmethod
+    def from_pairs(voters: np.ndarray, projects: np.ndarray, number_of_voters: int,
+                   projects_mask: np.ndarray, budget: int, constraint: int | None) -> 'ApprovalScope':
+        # Repeated votes of a voter are counted once
+        number_of_projects = len(projects_mask)
+        pairs = np.unique(voters * number_of_projects + projects)
+        voters, projects = np.divmod(pairs, number_of_projects)
+        indptr = np.zeros(number_of_voters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(voters, minlength=number_of_voters), out=indptr[1:])
+        return ApprovalScope(indptr, projects, projects_mask, budget, constraint)
+
+    def satisfaction(self, selection: np.ndarray) -> np.ndarray:
+        """
+        Number of approved and selected projects for every voter (rows) and outcome (columns).
+        """
+        cumulative = np.zeros((len(self.projects) + 1, selection.shape[1]), dtype=np.int64)
+        np.cumsum(selection[self.projects], axis=0, out=cumulative[1:])
+        return cumulative[self.indptr[1:]] - cumulative[self.indptr[:-1]]
+
+    def comparison(self, satisfaction: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        `compare_outcomes(satisfaction)`, computed once for the same satisfaction matrix.
+        """
+        if self._comparison is None or self._comparison[0] is not satisfaction:
+            self._comparison = (satisfaction, compare_outcomes(satisfaction))
+        return self._comparison[1]
+
+def compare_outcomes(satisfaction: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Numbers of voters that are more satisfied with the outcome in the row than with the outcome
+    in the column (`prefer`) and equally satisfied with both (`tie`). Voters less satisfied are `prefer.T`.
+    """
+    number_of_outcomes = satisfaction.shape[1]
+    prefer = np.zeros((number_of_outcomes, number_of_outcomes), dtype=np.int64)
+    if len(satisfaction) == 0 or number_of_outcomes < 2:
+        return prefer, np.full_like(prefer, len(satisfaction))
+
+    rows, weights = distinct_rows(satisfaction)
+    # Satisfaction with every outcome is contiguous, so comparisons of outcomes are fast
+    columns = np.ascontiguousarray(rows.T)
+    for i in range(number_of_outcomes - 1):
+        rest = columns[i + 1:]
+        if weights is None:
+            prefer[i, i + 1:] = np.count_nonzero(columns[i] > rest, axis=1)
+            prefer[i + 1:, i] = np.count_nonzero(columns[i] < rest, axis=1)
+        else:
+            prefer[i, i + 1:] = (columns[i] > rest) @ weights
+            prefer[i + 1:, i] = (columns[i] < rest) @ weights
+    return prefer, len(satisfaction) - prefer - prefer.T
+
+def distinct_rows(satisfaction: np.ndarray) -> Tuple[np.ndarray, np.ndarray | None]:
+    """
+    Distinct rows of the satisfaction matrix with numbers of voters having them (as floats, so products are fast).
+    Returns all rows without weights when a row does not fit in a single integer or most rows are distinct.
+    """
+    radix = int(satisfaction.max()) + 1
+    if radix ** satisfaction.shape[1] >= 2**63:
+        return satisfaction, None
+    keys = satisfaction @ (radix ** np.arange(satisfaction.shape[1], dtype=np.int64))
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    if len(first) > len(satisfaction) // 2:
+        return satisfaction, None
+    return satisfaction[first], counts.astype(np.float64)
+
+class MetricsEngine:
+    project_ids: np.ndarray
+    costs: np.ndarray
+    groups: Dict[str, ApprovalScope]
+    merged: ApprovalScope
+
+    def __init__(self, data: Dict[str, InputDataPerGroup]):
+        projects = [(p.id, p.cost, name) for name, d in data.items() for p in d.group.projects]
+        self.project_ids = np.array([p[0] for p in projects], dtype=np.int64)
+        self.costs = np.array([p[1] for p in projects], dtype=np.int64)
+        projects_groups = np.array([p[2] for p in projects], dtype=object)
+        self._rows = { _id: row for row, _id in enumerate(self.project_ids.tolist()) }
+
+        self.groups = {}
+        registry = get_voter_registry(get_groups(data))
+        merged_voters, merged_projects = [], []
+        for name, d in data.items():
+            voters, rows = self._pairs(d.group.profiles)
+            self.groups[name] = ApprovalScope.from_pairs(voters, rows, len(d.group.profiles),
+                                                         projects_groups == name, d.budget, d.constraint)
+            merged_voters.append(registry.group_rows[name][voters])
+            merged_projects.append(rows)
+
+        self.merged = ApprovalScope.from_pairs(np.concatenate([np.zeros(0, dtype=np.int64), *merged_voters]),
+                                               np.concatenate([np.zeros(0, dtype=np.int64), *merged_projects]),
+                                               len(registry), np.ones(len(projects), dtype=bool),
+                                               sum(d.budget for d in data.values()), None)
+
+    def _pairs(self, profiles: List[Profile]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Pairs (index of profile, project row) of all votes. Votes for unknown projects are skipped,
+        they can never be selected.
+        """
+        ballots = as_profiles_array(profiles)
+        voters = np.repeat(np.arange(len(ballots), dtype=np.int64), ballots.ballot_sizes())
+        known_ids = np.array(list(self._rows.keys()), dtype=np.int64)
+        known_rows = np.array(list(self._rows.values()), dtype=np.int64)
+        order = np.argsort(known_ids)
+        known_ids, known_rows = known_ids[order], known_rows[order]
+
+        positions = np.searchsorted(known_ids, ballots.votes)
+        positions[positions == len(known_ids)] = 0
+        known = known_ids[positions] == ballots.votes if len(known_ids) > 0 else np.zeros(len(voters), dtype=bool)
+        return voters[known], known_rows[positions[known]]
+
+    def selection(self, outcomes: List[List[int]]) -> np.ndarray:
+        selection = np.zeros((len(self.project_ids), len(outcomes)), dtype=np.int64)
+        for column, outcome in enumerate(outcomes):
+            selection[[self._rows[p] for p in outcome if p in self._rows], column] = 1
+        return selection
+
+def cost(scope: ApprovalScope, selection: np.ndarray, costs: np.ndarray, _satisfaction: np.ndarray) -> List[MetricResultType]:
+    return [int(c) for c in (costs * scope.projects_mask) @ selection]
+
+def average_satisfaction(scope: ApprovalScope, _selection: np.ndarray, _costs: np.ndarray, satisfaction: np.ndarray) -> List[MetricResultType]:
+    return [int(s) / scope.number_of_voters for s in satisfaction.sum(axis=0)]
+
+def budget_usage(scope: ApprovalScope, selection: np.ndarray, costs: np.ndarray, satisfaction: np.ndarray) -> List[MetricResultType]:
+    return [c / scope.budget for c in cost(scope, selection, costs, satisfaction)]
+
+def number_of_selected_projects(scope: ApprovalScope, selection: np.ndarray, _costs: np.ndarray, _satisfaction: np.ndarray) -> List[MetricResultType]:
+    return [int(n) for n in selection[scope.projects_mask].sum(axis=0)]
+
+def lower_constraint_satisfaction(scope: ApprovalScope, selection: np.ndarray, costs: np.ndarray, satisfaction: np.ndarray) -> List[MetricResultType]:
+    if scope.constraint is None:
+        return [0] * selection.shape[1]
+    return [c / scope.constraint for c in cost(scope, selection, costs, satisfaction)]
+
+def better_than(scope: ApprovalScope, satisfaction: np.ndarray) -> List[List[MetricResultType]]:
+    """
+    Matrix of shares of voters that prefer the outcome in the row over the outcome in the column.
+    """
+    prefer, _ = scope.comparison(satisfaction)
+    return [[int(n) / scope.number_of_voters for n in row] for row in prefer]
+
+def equally_good(scope: ApprovalScope, satisfaction: np.ndarray) -> List[List[MetricResultType]]:
+    """
+    Matrix of shares of voters equally satisfied with the outcomes in the row and in the column.
+    """
+    _, tie = scope.comparison(satisfaction)
+    return [[int(n) / scope.number_of_voters for n in row] for row in tie]
+
+VectorizedMetricUnaryType = Callable[[ApprovalScope, np.ndarray, np.ndarray, np.ndarray], List[MetricResultType]]
+VectorizedMetricBinaryType = Callable[[ApprovalScope, np.ndarray], List[List[MetricResultType]]]
+
+vectorized_metrics_unary: Dict[str, VectorizedMetricUnaryType] = {
+    "average_satisfaction": average_satisfaction,
+    "cost": cost,
+    "budget_usage": budget_usage,
+    "number_of_selected_projects": number_of_selected_projects,
+    "lower_constraint_satisfaction": lower_constraint_satisfaction,
+}
+vectorized_metrics_binary: Dict[str, VectorizedMetricBinaryType] = {
+    "better_than": better_than,
+    "equally_good": equally_good,
+}
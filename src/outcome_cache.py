@@ -0,0 +1,124 @@
+"""
+Cache of outcomes of methods, shared by runs. Every outcome is saved in a JSON file named after
+the hash of its key: fingerprint of data (hash of its content), method name, values of all parameters
+of the method and version of the code (hash of source files), so any change of them gives a new entry.
+
+The total size of files in the cache is bounded. When it grows above the limit, the least recently used
+entries are removed (reading an entry updates its modification time).
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .types import InputDataPerGroup, as_profiles_array
+from .logger import logger
+from .instrumentation import count
+from .parameters import ParametersGroup
+from .results import MethodOutcome
+
+
+CACHE_VERSION = 1
+DEFAULT_MAX_SIZE = 64 * 2**20
+
+code_version_cache: str | None = None
+
+def code_version() -> str:
+    """
+    Hash of source files of the package.
+    """
+    global code_version_cache
+    if code_version_cache is None:
+        sha = hashlib.sha256()
+        source_path = os.path.dirname(os.path.abspath(__file__))
+        for filename in sorted(os.listdir(source_path)):
+            if filename.endswith(".py"):
+                with open(os.path.join(source_path, filename), 'rb') as f:
+                    sha.update(filename.encode())
+                    sha.update(f.read())
+        code_version_cache = sha.hexdigest()
+    return code_version_cache
+
+# The last computed fingerprint with the data it was computed for
+data_fingerprint_cache: Tuple[Dict[str, InputDataPerGroup], str] | None = None
+
+def data_fingerprint(data: Dict[str, InputDataPerGroup]) -> str:
+    global data_fingerprint_cache
+    if data_fingerprint_cache is not None and data_fingerprint_cache[0] is data:
+        return data_fingerprint_cache[1]
+
+    sha = hashlib.sha256()
+    for name, d in data.items():
+        sha.update(json.dumps([name, d.budget, d.constraint]).encode())
+        sha.update(np.array([(p.id, p.cost) for p in d.group.projects], dtype=np.int64).tobytes())
+        profiles = as_profiles_array(d.group.profiles)
+        for array in [profiles.voter_ids, profiles.votes_indptr, profiles.votes, profiles.district_codes]:
+            sha.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+        sha.update(json.dumps(profiles.district_names).encode())
+    data_fingerprint_cache = (data, sha.hexdigest())
+    return data_fingerprint_cache[1]
+
+def outcome_key(fingerprint: str, method: str, parameters_group: ParametersGroup) -> str:
+    key = {
+        "version": CACHE_VERSION,
+        "code": code_version(),
+        "data": fingerprint,
+        "method": method,
+        "parameters": parameters_group.to_dict(),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+class OutcomeCache:
+    path: str
+    max_size: int
+
+    def __init__(self, path: str, max_size: int = DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key + ".json")
+
+    def get(self, key: str) -> MethodOutcome | None:
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r', encoding="utf-8") as f:
+                outcome = MethodOutcome.model_validate_json(f.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        count("outcome_cache.hits")
+        return outcome
+
+    def put(self, key: str, outcome: MethodOutcome) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        path = self.entry_path(key)
+        # Writing to a temporary file first, so other processes never read a partially written entry
+        with open(path + ".tmp", 'w', encoding="utf-8") as f:
+            f.write(outcome.model_dump_json(exclude={ "cprofile_stats" }))
+        os.replace(path + ".tmp", path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        for filename in os.listdir(self.path):
+            if filename.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.path, filename))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            logger.debug("Removing outcome %s from cache", filename)
+            try:
+                os.remove(os.path.join(self.path, filename))
+            except OSError:
+                pass
+            total_size -= size
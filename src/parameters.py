@@ -53,6 +53,9 @@ class ParametersGroup:
     def __contains__(self, name: str) -> bool:
         return name in self._parameters
 
+    def to_dict(self) -> Dict[str, Any]:
+        return { name: parameter.value for name, parameter in self._parameters.items() }
+
     def __repr__(self) -> str:
         return repr(self._parameters)
 
@@ -0,0 +1,44 @@
+"""
+Names and descriptions of methods and metrics, and parameters of methods. Implementations
+(`methods.py`, `metrics.py`) are not imported here, so listing methods and metrics and parsing
+arguments of the CLI does not load NumPy, pydantic or pabutools.
+"""
+
+from typing import Dict
+
+from .parameters import register_parameter
+
+
+methods_desc: Dict[str, str] = {
+    "greedy": "Greedy algorithm",
+    "mes_add_one": "Method of Equal Shares (AddOne)",
+    "modified_mes": "Modified Method of Equal Shares", # TODO: add description
+    "mes_constrained": "Method of Equal Shares (AddOne) prioritising groups below their lower bound constraints",
+}
+
+metrics_unary_desc: Dict[str, str] = {
+    "average_satisfaction": "Average satisfaction (number of selected projects that are also in the profile)",
+    "cost": "Total cost of selected projects",
+    "budget_usage": "Total cost of selected projects divided by budget",
+    "number_of_selected_projects": "Number of selected projects",
+    "lower_constraint_satisfaction": "Total cost of selected projects divided by constraint",
+}
+metrics_binary_desc: Dict[str, str] = {
+    "better_than": "Percentage of profiles that prefer projects selected by the first method over projects selected by the second method",
+    "equally_good": "Percentage of profiles equally satisfied with projects selected by both methods",
+}
+
+register_parameter("modified_mes", "step", float, 0.1)
+register_parameter("modified_mes", "part_of_initial_budget", float, 0.8)
+register_parameter("modified_mes", "engine", str, "numpy")
+register_parameter("modified_mes", "search", str, "linear")
+register_parameter("modified_mes", "arithmetic", str, "float")
+
+register_parameter("mes_add_one", "step", int, 20)
+register_parameter("mes_add_one", "engine", str, "numpy")
+register_parameter("mes_add_one", "search", str, "linear")
+register_parameter("mes_add_one", "arithmetic", str, "float")
+
+register_parameter("mes_constrained", "step", int, 20)
+register_parameter("mes_constrained", "search", str, "linear")
+register_parameter("mes_constrained", "arithmetic", str, "float")
@@ -1,4 +1,5 @@
 import json
+import pstats
 from typing import Any, Dict, List
 from datetime import datetime
 import os
@@ -13,11 +14,15 @@ from .logger import get_logs
 class MethodOutcome(BaseModel):
     selected_projects: List[int]
     time: float
+    # Timers and counters (see `instrumentation`) and cProfile stats (marshalled, as in `.prof` files)
+    profile: Dict[str, Any] | None = None
+    cprofile_stats: bytes | None = None
 
 class Results(BaseModel):
     outcomes: Dict[str, MethodOutcome]
     metrics_scores: MetricsScores
     district_results: Dict[str, MetricsScores]
+    profile: Dict[str, Any] | None = None
 
 def district_results_to_json(district_results: Dict[str, MetricsScores]) -> Dict[str, Any]:
     return {
@@ -30,13 +35,13 @@ def district_results_to_json(district_results: Dict[str, MetricsScores]) -> Dict
         for key, value in district_results.items()
     }
 
-def format_results(results: Results) -> str:
+def results_to_json(results: Results) -> Dict[str, Any]:
     methods_times = {}
 
     for name, outcome in results.outcomes.items():
         methods_times[name] = outcome.time
 
-    json_dict = {
+    return {
         "execution time (in seconds)": methods_times,
         "results": {
             metric: scores
@@ -45,7 +50,8 @@ def format_results(results: Results) -> str:
         "district_results": district_results_to_json(results.district_results)
     }
 
-    return json.dumps(json_dict, indent=4)
+def format_results(results: Results) -> str:
+    return json.dumps(results_to_json(results), indent=4)
 
 def format_outcomes(outcomes: Dict[str, List[int]]) -> str:
     return json.dumps(outcomes)
@@ -53,11 +59,28 @@ def format_outcomes(outcomes: Dict[str, List[int]]) -> str:
 def read_outcomes(outcomes: str) -> Dict[str, List[int]]:
     return json.loads(outcomes)
 
+def save_cprofile(stats: bytes, path: Path) -> None:
+    """
+    Saves cProfile stats as `[path].prof` (readable with `pstats` or `snakeviz`) and a flame graph `[path].svg`.
+    """
+    # flameprof imports pytest, which is slow, so it is imported only when needed
+    import flameprof
+
+    with open(path.with_suffix(".prof"), 'wb') as file:
+        file.write(stats)
+    with open(path.with_suffix(".svg"), 'w', encoding="utf-8") as file:
+        flameprof.render(pstats.Stats(str(path.with_suffix(".prof"))).stats, file) # type: ignore
+
 def save_results(results: Results, results_path: str) -> None:
     now = datetime.now()
     now_str = now.strftime("%Y-%m-%d %H:%M:%S")
 
     results_dir = Path(results_path) / now_str
+    # Runs with cached outcomes can finish within the same second
+    suffix = 1
+    while results_dir.exists():
+        suffix += 1
+        results_dir = Path(results_path) / f"{now_str} ({suffix})"
     results_dir.mkdir(parents=True)
 
     outcomes = {
@@ -73,6 +96,13 @@ def save_results(results: Results, results_path: str) -> None:
     with open(results_dir / "logs.txt", 'w', encoding="utf-8") as file:
         file.write(get_logs())
 
+    if results.profile is not None:
+        with open(results_dir / "profile.json", 'w', encoding="utf-8") as file:
+            json.dump(results.profile, file, indent=4)
+    for name, outcome in results.outcomes.items():
+        if outcome.cprofile_stats is not None:
+            save_cprofile(outcome.cprofile_stats, results_dir / name)
+
     latest_path = Path(results_path) / "latest"
     if latest_path.is_symlink():
         latest_path.unlink()
@@ -1,12 +1,19 @@
+import cProfile
+import marshal
 import time
-from typing import Dict, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Set, Tuple
 
 from .types import ConstraintsType, InputDataPerGroup
 from .results import MethodOutcome, Results
 from .logger import logger
+from .instrumentation import ProfileType, collect, timer
 from .parameters import Parameters, ParametersGroup
-from .metrics import MetricsScores, metrics_unary, metrics_binary
+from .metrics import MetricResultType, MetricScores, MetricsScores, metrics_unary, metrics_binary
+from .metrics_engine import MetricsEngine, vectorized_metrics_unary, vectorized_metrics_binary
 from .methods import methods
+from .mes import prepare_data
+from .outcome_cache import OutcomeCache, data_fingerprint, outcome_key
 
 
 class RunOptions:
@@ -14,30 +21,125 @@ class RunOptions:
     metrics_to_run: Set[str]
     parameters: Parameters
     constraints: ConstraintsType
+    jobs: int
+    cprofile: bool
+    outcome_cache: OutcomeCache | None
 
-    def __init__(self, methods_to_run: Set[str], metrics_to_run: Set[str], parameters: Parameters, constraints: ConstraintsType):
+    def __init__(self, methods_to_run: Set[str], metrics_to_run: Set[str], parameters: Parameters, constraints: ConstraintsType,
+                 jobs: int = 1, cprofile: bool = False, outcome_cache: OutcomeCache | None = None):
         self.methods_to_run = methods_to_run
         self.metrics_to_run = metrics_to_run
         self.parameters = parameters
         self.constraints = constraints
+        self.jobs = jobs
+        self.cprofile = cprofile
+        self.outcome_cache = outcome_cache
 
-def run_methods(data: Dict[str, InputDataPerGroup], run_options: RunOptions) -> Dict[str, MethodOutcome]:
-    results: Dict[str, MethodOutcome] = {}
-
-    for name, method in methods.items():
-        if name not in run_options.methods_to_run:
-            continue
-        logger.info("Running method %s...", name)
+def run_method(data: Dict[str, InputDataPerGroup], name: str, parameters_group: ParametersGroup,
+               cprofile: bool = False) -> MethodOutcome:
+    """
+    Runs the method and records its timers and counters. With `cprofile`, the method is also profiled
+    with cProfile (which slows it down) and the stats are kept in the outcome, in the format of `.prof` files.
+    """
+    profiler = cProfile.Profile() if cprofile else None
+    with collect() as profile:
+        if profiler is not None:
+            profiler.enable()
         start = time.time()
-        parameters_group = run_options.parameters[name] if name in run_options.parameters \
-                              else ParametersGroup()
-        result = method(data, parameters_group)
+        result = methods[name](data, parameters_group)
         end = time.time()
-        results[name] = MethodOutcome(
-            selected_projects=result,
-            time=end - start
-        )
-    return results
+        if profiler is not None:
+            profiler.disable()
+
+    cprofile_stats = None
+    if profiler is not None:
+        profiler.create_stats()
+        cprofile_stats = marshal.dumps(profiler.stats) # type: ignore
+    return MethodOutcome(
+        selected_projects=result,
+        time=end - start,
+        profile=profile,
+        cprofile_stats=cprofile_stats,
+    )
+
+# Data is passed to worker processes once, when they start, and not with every task
+worker_data: Dict[str, InputDataPerGroup] = {}
+
+def init_worker(data: Dict[str, InputDataPerGroup]) -> None:
+    global worker_data
+    worker_data = data
+    prepare_data(data)
+
+def run_method_in_worker(name: str, parameters_group: ParametersGroup, cprofile: bool = False) -> MethodOutcome:
+    return run_method(worker_data, name, parameters_group, cprofile)
+
+MethodTask = Tuple[str, ParametersGroup]
+
+def run_method_tasks(data: Dict[str, InputDataPerGroup], tasks: Dict[str, MethodTask], jobs: int = 1,
+                     cprofile: bool = False, outcome_cache: OutcomeCache | None = None,
+                     prepare_profile: ProfileType | None = None) -> Dict[str, MethodOutcome]:
+    """
+    Runs every task (a method with its parameters) and returns outcomes under the keys of tasks.
+    With `jobs > 1` tasks are run in a pool of processes, each of them receiving the data once.
+    Outcomes found in `outcome_cache` are not computed again (unless methods are profiled),
+    and computed outcomes are saved in it.
+    Data shared by methods is prepared before the first method is timed; timers of preparing it
+    are put in `prepare_profile` (empty if no method is computed).
+    """
+    if outcome_cache is None:
+        return compute_method_tasks(data, tasks, jobs, cprofile, prepare_profile)
+
+    fingerprint = data_fingerprint(data)
+    keys = { key: outcome_key(fingerprint, name, parameters_group) for key, (name, parameters_group) in tasks.items() }
+    cached: Dict[str, MethodOutcome] = {}
+    if not cprofile:
+        for key in tasks.keys():
+            outcome = outcome_cache.get(keys[key])
+            if outcome is not None:
+                logger.info("Using cached outcome of method %s", key)
+                cached[key] = outcome
+
+    computed = compute_method_tasks(data, { k: t for k, t in tasks.items() if k not in cached }, jobs, cprofile,
+                                    prepare_profile)
+    for key, outcome in computed.items():
+        outcome_cache.put(keys[key], outcome)
+    return { key: cached[key] if key in cached else computed[key] for key in tasks.keys() }
+
+def compute_method_tasks(data: Dict[str, InputDataPerGroup], tasks: Dict[str, MethodTask], jobs: int = 1,
+                         cprofile: bool = False, prepare_profile: ProfileType | None = None) -> Dict[str, MethodOutcome]:
+    if len(tasks) == 0:
+        return {}
+    # Workers are forked after this, so they get prepared data in caches (`init_worker` prepares it otherwise)
+    with collect() as profile:
+        prepare_data(data)
+    if prepare_profile is not None:
+        prepare_profile.update(profile)
+
+    if jobs <= 1 or len(tasks) <= 1:
+        results: Dict[str, MethodOutcome] = {}
+        for key, (name, parameters_group) in tasks.items():
+            logger.info("Running method %s...", key)
+            results[key] = run_method(data, name, parameters_group, cprofile)
+        return results
+
+    logger.info("Running methods %s in %d processes...", ', '.join(tasks.keys()), jobs)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)),
+                             initializer=init_worker, initargs=(data,)) as executor:
+        futures = {
+            key: executor.submit(run_method_in_worker, name, parameters_group, cprofile)
+            for key, (name, parameters_group) in tasks.items()
+        }
+        # Results are collected in the order of tasks, not in the order of completion
+        return { key: future.result() for key, future in futures.items() }
+
+def run_methods(data: Dict[str, InputDataPerGroup], run_options: RunOptions,
+                prepare_profile: ProfileType | None = None) -> Dict[str, MethodOutcome]:
+    to_run = {
+        name: (name, run_options.parameters[name] if name in run_options.parameters else ParametersGroup())
+        for name in methods.keys() if name in run_options.methods_to_run
+    }
+    return run_method_tasks(data, to_run, run_options.jobs, run_options.cprofile, run_options.outcome_cache,
+                            prepare_profile)
 
 def run_metrics(data: Dict[str, InputDataPerGroup], outcomes: Dict[str, MethodOutcome], run_options: RunOptions) -> Tuple[MetricsScores, Dict[str, MetricsScores]]:
     metrics_scores: MetricsScores = {}
@@ -45,41 +147,87 @@ def run_metrics(data: Dict[str, InputDataPerGroup], outcomes: Dict[str, MethodOu
         group_name: {} for group_name in data.keys()
     }
 
+    with timer("metrics.engine"):
+        engine = MetricsEngine(data)
+        methods_names = list(outcomes.keys())
+        selection = engine.selection([outcome.selected_projects for outcome in outcomes.values()])
+        satisfaction = engine.merged.satisfaction(selection)
+        satisfaction_for_group = { group_name: scope.satisfaction(selection) for group_name, scope in engine.groups.items() }
+
     for metric_name, (metric_u, metric_u_for_group) in metrics_unary.items():
         if metric_name not in run_options.metrics_to_run:
             continue
-        for method_name, outcome in outcomes.items():
-            if metric_u is not None:
-                if metric_name not in metrics_scores:
-                    metrics_scores[metric_name] = {}
-                metrics_scores[metric_name][method_name] = metric_u(data, outcome.selected_projects)
-            if metric_u_for_group is not None:
-                for group_name, group in data.items():
-                    if metric_name not in metrics_scores_for_group[group_name]:
-                        metrics_scores_for_group[group_name][metric_name] = {}
-                    metrics_scores_for_group[group_name][metric_name][method_name] = metric_u_for_group(group, outcome.selected_projects)
+        with timer(f"metrics.{metric_name}"):
+            if metric_name in vectorized_metrics_unary:
+                vectorized = vectorized_metrics_unary[metric_name]
+                if metric_u is not None:
+                    metrics_scores[metric_name] = dict(zip(
+                        methods_names, vectorized(engine.merged, selection, engine.costs, satisfaction)
+                    ))
+                if metric_u_for_group is not None:
+                    for group_name, scope in engine.groups.items():
+                        metrics_scores_for_group[group_name][metric_name] = dict(zip(
+                            methods_names, vectorized(scope, selection, engine.costs, satisfaction_for_group[group_name])
+                        ))
+                continue
+            for method_name, outcome in outcomes.items():
+                if metric_u is not None:
+                    if metric_name not in metrics_scores:
+                        metrics_scores[metric_name] = {}
+                    metrics_scores[metric_name][method_name] = metric_u(data, outcome.selected_projects)
+                if metric_u_for_group is not None:
+                    for group_name, group in data.items():
+                        if metric_name not in metrics_scores_for_group[group_name]:
+                            metrics_scores_for_group[group_name][metric_name] = {}
+                        metrics_scores_for_group[group_name][metric_name][method_name] = metric_u_for_group(group, outcome.selected_projects)
+
+    def pairs_scores(matrix: List[List[MetricResultType]]) -> MetricScores:
+        return {
+            f"{method_name} vs {method_name2}": matrix[i][j]
+            for i, method_name in enumerate(methods_names)
+            for j, method_name2 in enumerate(methods_names)
+            if i != j
+        }
 
     for metric_name, (metric_b, metric_b_for_group) in metrics_binary.items():
         if metric_name not in run_options.metrics_to_run:
             continue
-        for method_name, outcome in outcomes.items():
-            for method_name2, outcome2 in outcomes.items():
-                if method_name == method_name2:
-                    continue
-                method_entry_name = f"{method_name} vs {method_name2}"
+        with timer(f"metrics.{metric_name}"):
+            if metric_name in vectorized_metrics_binary:
+                vectorized_b = vectorized_metrics_binary[metric_name]
                 if metric_b is not None:
-                    if metric_name not in metrics_scores:
-                        metrics_scores[metric_name] = {}
-                    metrics_scores[metric_name][method_entry_name] = metric_b(data, outcome.selected_projects, outcome2.selected_projects)
+                    metrics_scores[metric_name] = pairs_scores(vectorized_b(engine.merged, satisfaction))
                 if metric_b_for_group is not None:
-                    for group_name, group in data.items():
-                        if metric_name not in metrics_scores_for_group[group_name]:
-                            metrics_scores_for_group[group_name][metric_name] = {}
-                        metrics_scores_for_group[group_name][metric_name][method_entry_name] = metric_b_for_group(group, outcome.selected_projects, outcome2.selected_projects)
+                    for group_name, scope in engine.groups.items():
+                        metrics_scores_for_group[group_name][metric_name] = \
+                            pairs_scores(vectorized_b(scope, satisfaction_for_group[group_name]))
+                continue
+            for method_name, outcome in outcomes.items():
+                for method_name2, outcome2 in outcomes.items():
+                    if method_name == method_name2:
+                        continue
+                    method_entry_name = f"{method_name} vs {method_name2}"
+                    if metric_b is not None:
+                        if metric_name not in metrics_scores:
+                            metrics_scores[metric_name] = {}
+                        metrics_scores[metric_name][method_entry_name] = metric_b(data, outcome.selected_projects, outcome2.selected_projects)
+                    if metric_b_for_group is not None:
+                        for group_name, group in data.items():
+                            if metric_name not in metrics_scores_for_group[group_name]:
+                                metrics_scores_for_group[group_name][metric_name] = {}
+                            metrics_scores_for_group[group_name][metric_name][method_entry_name] = metric_b_for_group(group, outcome.selected_projects, outcome2.selected_projects)
 
     return metrics_scores, metrics_scores_for_group
 
 def run(data: Dict[str, InputDataPerGroup], run_options: RunOptions) -> Results:
-    outcomes = run_methods(data, run_options)
-    metrics_scores, metrics_results_for_group = run_metrics(data, outcomes, run_options)
-    return Results(outcomes=outcomes, metrics_scores=metrics_scores, district_results=metrics_results_for_group)
+    prepare_profile: ProfileType = {}
+    outcomes = run_methods(data, run_options, prepare_profile)
+    with collect() as metrics_profile:
+        metrics_scores, metrics_results_for_group = run_metrics(data, outcomes, run_options)
+    profile = {
+        "prepare": prepare_profile,
+        "methods": { name: outcome.profile for name, outcome in outcomes.items() },
+        "metrics": metrics_profile,
+    }
+    return Results(outcomes=outcomes, metrics_scores=metrics_scores, district_results=metrics_results_for_group,
+                   profile=profile)
@@ -0,0 +1,236 @@
+"""
+Service that keeps elections (data directories) loaded in memory and runs methods and metrics
+on them on request. Requests are handled by an asyncio HTTP server (on a TCP port or a Unix socket),
+and computations run in a pool of worker processes. Every worker receives all elections once,
+when it starts, and prepares their merged data and approval matrices, which it keeps for its whole life
+(what-if queries reuse them and do not replace them), so requests only run methods.
+
+Endpoints (all responses are JSON):
+- `GET /elections` - loaded elections with sizes of their groups,
+- `GET /methods`, `GET /metrics` - available methods (with default parameters) and metrics,
+- `POST /run` - runs methods and metrics, the body is a JSON object with keys (all optional):
+  `election` (required if more elections are loaded), `methods` and `metrics` (lists of names, `all` by default),
+  `parameters` (`{"mes_add_one.step": 10}`), and for what-if queries `budgets` and `constraints`
+  (new values for groups, e.g. `{"citywide": 100000}`).
+  The response has the format of `results.json`, with outcomes under `methods_outcomes` key.
+"""
+
+import asyncio
+import json
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Set, Tuple
+from urllib.parse import urlsplit
+
+from .types import InputDataPerGroup, Project
+from .logger import logger
+from .parameters import get_default_parameters
+from .load_data import load_input_data, read_constraints
+from .results import results_to_json
+from .registry import methods_desc, metrics_unary_desc, metrics_binary_desc
+from .mes import approval_matrix_cache, get_approval_matrix, prepare_data
+from .mes_engine import ApprovalMatrix
+from .run import RunOptions, run
+from .utils import fold_dict, get_merged_input_data, merged_input_data, remember
+
+
+REASONS = { 200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error" }
+
+Elections = Dict[str, Dict[str, InputDataPerGroup]]
+
+class ServeOptions:
+    host: str
+    port: int
+    socket_path: str | None
+    jobs: int
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, socket_path: str | None = None, jobs: int = 1):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.jobs = jobs
+
+def load_elections(paths: List[str], use_data_cache: bool = True) -> Elections:
+    elections: Elections = {}
+    for path in paths:
+        logger.info("Loading %s...", path)
+        cache_path = f"{path}/.cache" if use_data_cache else None
+        elections[path] = load_input_data(path, read_constraints(path), 1, cache_path)
+    return elections
+
+def election_summary(data: Dict[str, InputDataPerGroup]) -> Dict[str, Any]:
+    return {
+        name: { "projects": len(d.group.projects), "profiles": len(d.group.profiles), "budget": d.budget,
+                "constraint": d.constraint }
+        for name, d in data.items()
+    }
+
+# Elections kept by this worker process, with their merged data and approval matrices of all projects
+worker_elections: Elections = {}
+worker_prepared: Dict[str, Tuple[InputDataPerGroup, ApprovalMatrix]] = {}
+
+def init_worker(elections: Elections) -> None:
+    global worker_elections, worker_prepared
+    worker_elections = elections
+    worker_prepared = {}
+    for name, data in elections.items():
+        prepare_data(data)
+        projects: List[Project] = fold_dict(lambda x, d: x + d.group.projects, [], data)
+        merged = get_merged_input_data(data)
+        worker_prepared[name] = (merged, get_approval_matrix(projects, merged.group.profiles))
+
+def use_prepared(name: str, data: Dict[str, InputDataPerGroup]) -> None:
+    """
+    Puts data prepared for election `name` in caches of `get_merged_input_data` and `get_approval_matrix`,
+    as data of `data` (the election or its what-if view), so methods run on `data` do not build it again.
+    """
+    merged, matrix = worker_prepared[name]
+    remember(merged_input_data, (data, merged.model_copy(update={ "budget": sum(d.budget for d in data.values()) })))
+    remember(approval_matrix_cache, (merged.group.profiles, [(p.id, p.cost) for p in merged.group.projects], matrix))
+
+def warm_up() -> None:
+    """
+    Empty task, which makes the pool start a worker (and prepare elections in it) before the first request.
+    """
+
+def check_group_values(values: Any, data: Dict[str, InputDataPerGroup], kind: str, optional: bool = False) -> None:
+    if not isinstance(values, dict):
+        raise ValueError(f"Object with {kind} of groups expected")
+    for name, value in values.items():
+        if name not in data:
+            raise ValueError(f"Unknown group: {name}")
+        if value is None and optional:
+            continue
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"Non-negative integer expected as {kind[:-1]} of group {name}: {value}")
+
+def election_view(data: Dict[str, InputDataPerGroup], budgets: Any, constraints: Any) -> Dict[str, InputDataPerGroup]:
+    """
+    Data with changed budgets and constraints of groups (`None` removes a constraint). Groups are shared with `data`.
+    """
+    check_group_values(budgets, data, "budgets")
+    check_group_values(constraints, data, "constraints", optional=True)
+    if len(budgets) == 0 and len(constraints) == 0:
+        return data
+    return {
+        name: d.model_copy(update={
+            "budget": budgets.get(name, d.budget),
+            "constraint": constraints[name] if name in constraints else d.constraint,
+        })
+        for name, d in data.items()
+    }
+
+def select_names(requested: Any, available: List[str], kind: str) -> Set[str]:
+    if not isinstance(requested, list):
+        raise ValueError(f"List of {kind} expected")
+    if "all" in requested:
+        return set(available)
+    for name in requested:
+        if name not in available:
+            raise ValueError(f"Unknown {kind[:-1]}: {name}")
+    return set(requested)
+
+def run_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    name = request.get("election")
+    if name is None and len(worker_elections) == 1:
+        name = next(iter(worker_elections.keys()))
+    if name not in worker_elections:
+        raise ValueError(f"Unknown election: {name}")
+
+    methods_to_run = select_names(request.get("methods", ["all"]), list(methods_desc.keys()), "methods")
+    if len(methods_to_run) == 0:
+        raise ValueError("No methods selected")
+    requested_metrics = request.get("metrics", ["all"])
+    if "all" in requested_metrics and len(methods_to_run) == 1:
+        metrics_to_run = set(metrics_unary_desc.keys())
+    else:
+        metrics_to_run = select_names(requested_metrics, [*metrics_unary_desc.keys(), *metrics_binary_desc.keys()], "metrics")
+    if len(methods_to_run) == 1 and any(m in metrics_binary_desc for m in metrics_to_run):
+        raise ValueError("Only one method selected, but used a metric that compares outcomes of two methods")
+
+    parameters = get_default_parameters()
+    parameters.merge_with_parameters_from_cli(request.get("parameters", {}))
+    data = election_view(worker_elections[name], request.get("budgets", {}), request.get("constraints", {}))
+    use_prepared(name, data)
+
+    results = run(data, RunOptions(methods_to_run=methods_to_run, metrics_to_run=metrics_to_run,
+                                   parameters=parameters, constraints=None))
+    return {
+        "election": name,
+        "methods_outcomes": { method: outcome.selected_projects for method, outcome in results.outcomes.items() },
+        **results_to_json(results),
+    }
+
+async def respond(method: str, target: str, body: bytes, executor: Executor,
+                  summaries: Dict[str, Any]) -> Tuple[int, Any]:
+    path = urlsplit(target).path
+    if method == "GET" and path == "/elections":
+        return 200, summaries
+    if method == "GET" and path == "/methods":
+        parameters = get_default_parameters()
+        return 200, {
+            name: { "description": desc, "parameters": parameters[name].to_dict() if name in parameters else {} }
+            for name, desc in methods_desc.items()
+        }
+    if method == "GET" and path == "/metrics":
+        return 200, {
+            **{ name: { "description": desc, "binary": False } for name, desc in metrics_unary_desc.items() },
+            **{ name: { "description": desc, "binary": True } for name, desc in metrics_binary_desc.items() },
+        }
+    if method == "POST" and path == "/run":
+        request = json.loads(body or b"{}")
+        if not isinstance(request, dict):
+            raise ValueError("JSON object expected")
+        return 200, await asyncio.get_running_loop().run_in_executor(executor, run_request, request)
+    return 404, { "error": f"Not found: {method} {path}" }
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, executor: Executor,
+                            summaries: Dict[str, Any]) -> None:
+    """
+    Handles a single HTTP request (the connection is closed after the response).
+    """
+    status: int
+    response: Any
+    try:
+        method, target, _ = (await reader.readline()).decode().split(" ", 2)
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode()
+            if line.strip() == "":
+                break
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        status, response = await respond(method, target, body, executor, summaries)
+        logger.info("%s %s %d", method, target, status)
+    except (ValueError, KeyError) as ex:
+        status, response = 400, { "error": str(ex) }
+    except Exception as ex:
+        logger.exception("Request failed")
+        status, response = 500, { "error": str(ex) }
+
+    payload = json.dumps(response).encode()
+    writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(elections: Elections, serve_options: ServeOptions) -> None:
+    summaries = { path: election_summary(data) for path, data in elections.items() }
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=serve_options.jobs, initializer=init_worker, initargs=(elections,)) as executor:
+        logger.info("Starting %d workers...", serve_options.jobs)
+        await asyncio.gather(*(loop.run_in_executor(executor, warm_up) for _ in range(serve_options.jobs)))
+
+        handler = partial(handle_connection, executor=executor, summaries=summaries)
+        if serve_options.socket_path is not None:
+            server = await asyncio.start_unix_server(handler, path=serve_options.socket_path)
+            address = serve_options.socket_path
+        else:
+            server = await asyncio.start_server(handler, serve_options.host, serve_options.port)
+            address = f"http://{serve_options.host}:{serve_options.port}"
+        logger.info("Serving %d elections on %s", len(elections), address)
+        async with server:
+            await server.serve_forever()
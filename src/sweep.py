@@ -0,0 +1,135 @@
+"""
+Sweep over values of method parameters. Values of swept parameters are provided in the format
+`[group].[parameter]=[values]`, where values are a comma-separated list (`mes_add_one.step=1,5,20`)
+or, for numeric parameters, an inclusive range `start:stop:step` (`modified_mes.step=0.1:1:0.1`).
+
+Every combination of values (for a method whose name is the group of parameters) is a configuration.
+Configurations with the same values are run once, data is loaded once and shared by all of them.
+Configurations are compared with unary metrics and saved as a single CSV table with a row per configuration.
+"""
+
+import csv
+import math
+from copy import deepcopy
+from itertools import product
+from typing import Any, Dict, List, Set, Tuple, Type
+
+from .types import ConstraintsType, InputDataPerGroup
+from .logger import logger
+from .parameters import Parameters, ParametersGroup
+from .metrics import metrics_unary
+from .methods import methods
+from .run import MethodTask, RunOptions, run_method_tasks, run_metrics
+from .outcome_cache import OutcomeCache
+
+
+SweepRow = Dict[str, Any]
+
+class SweepOptions(RunOptions):
+    grid: Dict[str, List[Any]]
+
+    def __init__(self, methods_to_run: Set[str], metrics_to_run: Set[str], parameters: Parameters, constraints: ConstraintsType,
+                 grid: Dict[str, List[Any]], jobs: int = 1, outcome_cache: OutcomeCache | None = None):
+        super().__init__(methods_to_run, metrics_to_run, parameters, constraints, jobs, outcome_cache=outcome_cache)
+        self.grid = grid
+
+def parse_values(t: Type, values: str) -> List[Any]:
+    if ':' not in values:
+        return [t(v) for v in values.split(',')]
+    if t not in (int, float):
+        raise ValueError(f"Range of values is allowed only for numeric parameters: {values}")
+    splitted = values.split(':')
+    if len(splitted) != 3:
+        raise ValueError(f"Invalid range format (start:stop:step): {values}")
+    start, stop, step = map(t, splitted)
+    if step <= 0:
+        raise ValueError(f"Step of range must be positive: {values}")
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    if count <= 0:
+        raise ValueError(f"Empty range: {values}")
+    # Rounding removes floating point noise, e.g. 0.30000000000000004 instead of 0.3
+    return [t(round(start + i * step, 12)) for i in range(count)]
+
+def parse_grid(parameters: Parameters, provided_grid: Dict[str, str]) -> Dict[str, List[Any]]:
+    grid: Dict[str, List[Any]] = {}
+    for parameter, values in provided_grid.items():
+        splitted = parameter.split(".")
+        if len(splitted) != 2:
+            raise ValueError(f"Invalid parameter name (format group.name): {parameter}")
+        group, name = splitted
+        if group not in parameters:
+            raise ValueError(f"Unknown parameter group: {group}")
+        if name not in parameters[group]:
+            raise ValueError(f"Unknown parameter: {group}.{name}")
+        grid[parameter] = parse_values(parameters[group].get_type(name), values)
+    return grid
+
+def configuration_name(method: str, values: Dict[str, Any]) -> str:
+    return " ".join([method, *(f"{name}={value}" for name, value in values.items())])
+
+def configurations(sweep_options: SweepOptions) -> Dict[str, Tuple[str, Dict[str, Any], ParametersGroup]]:
+    """
+    Returns method, values of swept parameters and all parameters of every distinct configuration.
+    """
+    for parameter in sweep_options.grid.keys():
+        if parameter.split(".")[0] not in sweep_options.methods_to_run:
+            raise ValueError(f"Parameter {parameter} is swept, but method {parameter.split('.')[0]} is not run")
+
+    result: Dict[str, Tuple[str, Dict[str, Any], ParametersGroup]] = {}
+    for method in methods.keys():
+        if method not in sweep_options.methods_to_run:
+            continue
+        swept = {
+            parameter.split(".")[1]: values
+            for parameter, values in sweep_options.grid.items() if parameter.split(".")[0] == method
+        }
+        for combination in product(*swept.values()):
+            parameters_group = deepcopy(sweep_options.parameters[method]) \
+                               if method in sweep_options.parameters else ParametersGroup()
+            for name, value in zip(swept.keys(), combination):
+                parameters_group[name] = value
+            values = { name: parameters_group[name] for name in swept.keys() }
+            name = configuration_name(method, values)
+            if name not in result:
+                result[name] = (method, values, parameters_group)
+    return result
+
+def run_sweep(data: Dict[str, InputDataPerGroup], sweep_options: SweepOptions) -> List[SweepRow]:
+    to_run = configurations(sweep_options)
+    logger.info("Sweeping %d configurations", len(to_run))
+
+    tasks: Dict[str, MethodTask] = { name: (method, group) for name, (method, _, group) in to_run.items() }
+    outcomes = run_method_tasks(data, tasks, sweep_options.jobs, outcome_cache=sweep_options.outcome_cache)
+    metrics_scores, metrics_scores_for_group = run_metrics(data, outcomes, sweep_options)
+
+    rows: List[SweepRow] = []
+    for name, (method, values, _) in to_run.items():
+        row: SweepRow = { "method": method }
+        row.update({ f"{method}.{parameter}": value for parameter, value in values.items() })
+        row["time"] = outcomes[name].time
+        for metric_name, (metric_u, _) in metrics_unary.items():
+            if metric_name not in sweep_options.metrics_to_run:
+                continue
+            # Metrics defined only for groups are reported for every group
+            if metric_u is not None:
+                row[metric_name] = metrics_scores[metric_name][name]
+            else:
+                for group_name, scores in metrics_scores_for_group.items():
+                    row[f"{metric_name} ({group_name})"] = scores[metric_name][name]
+        row["selected_projects"] = " ".join(map(str, outcomes[name].selected_projects))
+        rows.append(row)
+    return rows
+
+def save_sweep(rows: List[SweepRow], output_path: str) -> None:
+    # Columns: method, swept parameters of all methods, time and metrics, selected projects
+    columns: List[str] = ["method"]
+    for row in rows:
+        columns.extend(c for c in row.keys() if c.startswith(f"{row['method']}.") and c not in columns)
+    for row in rows:
+        columns.extend(c for c in row.keys() if c != "selected_projects" and c not in columns)
+    columns.append("selected_projects")
+
+    with open(output_path, 'w', encoding="utf-8", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,195 @@
+"""
+Synthetic elections. Every voter belongs to one district and votes both in the citywide election
+and in the election of its district (with the same voter id, as in real data). As in `.pb` files,
+districts of voters are provided only in the citywide election.
+
+Elections are generated directly in columns (see `ColumnarGroup`), in the same format as returned
+by `load_data_columns`, so they can be used instead of data loaded from files (`generate_data`)
+or saved as `.pb` files with `constraints.json` (`save_election`).
+Generation is vectorized, so elections with millions of voters take seconds.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .types import ColumnarGroup, ConstraintsType, InputDataPerGroup
+from .load_data import save_file_columns
+
+
+COST_DISTRIBUTIONS = ["lognormal", "uniform", "pareto"]
+APPROVALS_DISTRIBUTIONS = ["poisson", "geometric", "uniform", "fixed"]
+
+class SyntheticOptions:
+    """
+    - `projects` are split equally between districts and the citywide election,
+    - sizes of districts follow Zipf's law with exponent `district_skew` (0 means equal sizes),
+    - costs of projects have median `cost_median` and distribution `costs`,
+    - ballot sizes have mean `average_approvals` and distribution `approvals`,
+      popularity of projects follows Zipf's law with exponent `popularity_skew`,
+    - the budget of every election is `budget_share` of the total cost of its projects,
+    - if `constraint_share` is positive, the lower bound constraint of every election
+      is `constraint_share` of its budget (as in `create_constraints.py`).
+    """
+    voters: int
+    projects: int
+    districts: int
+    district_skew: float
+    costs: str
+    cost_median: int
+    approvals: str
+    average_approvals: float
+    popularity_skew: float
+    budget_share: float
+    constraint_share: float
+    seed: int
+
+    def __init__(self, voters: int = 10000, projects: int = 100, districts: int = 5, district_skew: float = 0,
+                 costs: str = "lognormal", cost_median: int = 200000, approvals: str = "poisson",
+                 average_approvals: float = 5, popularity_skew: float = 1, budget_share: float = 0.3,
+                 constraint_share: float = 0, seed: int = 0):
+        if voters < 1 or projects < districts + 1 or districts < 0:
+            raise ValueError("Synthetic election needs a voter and a project for the citywide election and every district")
+        if costs not in COST_DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution of costs: {costs} (available: {', '.join(COST_DISTRIBUTIONS)})")
+        if approvals not in APPROVALS_DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution of approvals: {approvals} (available: {', '.join(APPROVALS_DISTRIBUTIONS)})")
+        if average_approvals < 1 or cost_median < 1 or budget_share <= 0 or constraint_share < 0:
+            raise ValueError("Average approvals must be at least 1, median cost and budget share must be positive "
+                             "and constraint share must not be negative")
+        self.voters = voters
+        self.projects = projects
+        self.districts = districts
+        self.district_skew = district_skew
+        self.costs = costs
+        self.cost_median = cost_median
+        self.approvals = approvals
+        self.average_approvals = average_approvals
+        self.popularity_skew = popularity_skew
+        self.budget_share = budget_share
+        self.constraint_share = constraint_share
+        self.seed = seed
+
+    def __repr__(self) -> str:
+        return ",".join(f"{name}={value}" for name, value in vars(self).items())
+
+def zipf_weights(n: int, skew: float) -> np.ndarray:
+    weights = 1 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+def generate_costs(rng: np.random.Generator, n: int, options: SyntheticOptions) -> np.ndarray:
+    if options.costs == "lognormal":
+        costs = options.cost_median * rng.lognormal(0, 0.8, n)
+    elif options.costs == "uniform":
+        costs = options.cost_median * rng.uniform(0.1, 1.9, n)
+    else:
+        # Pareto distribution with the minimal value 1 has median 2^(1 / shape)
+        costs = options.cost_median * (rng.pareto(1.5, n) + 1) / 2 ** (1 / 1.5)
+    # Costs are rounded to thousands, as usual in real elections
+    return np.maximum(np.round(costs, -3), 1000).astype(np.int64)
+
+def generate_ballot_sizes(rng: np.random.Generator, n: int, options: SyntheticOptions) -> np.ndarray:
+    mean = options.average_approvals
+    if options.approvals == "poisson":
+        return rng.poisson(mean - 1, n) + 1
+    if options.approvals == "geometric":
+        return rng.geometric(1 / mean, n)
+    if options.approvals == "uniform":
+        return rng.integers(1, int(round(2 * mean - 1)) + 1, n)
+    return np.full(n, int(round(mean)), dtype=np.int64)
+
+def generate_ballots(rng: np.random.Generator, number_of_voters: int, number_of_projects: int,
+                     options: SyntheticOptions) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns `votes_indptr` and `votes` (indices of projects) of approval ballots.
+    """
+    weights = rng.permutation(zipf_weights(number_of_projects, options.popularity_skew))
+    sizes = np.minimum(generate_ballot_sizes(rng, number_of_voters, options), number_of_projects)
+    voters = np.repeat(np.arange(number_of_voters, dtype=np.int64), sizes)
+    projects = rng.choice(number_of_projects, size=len(voters), p=weights)
+    # Repeated choices of a voter are removed, so ballots can be a bit smaller than drawn
+    pairs = np.unique(voters * number_of_projects + projects)
+    voters, projects = np.divmod(pairs, number_of_projects)
+    indptr = np.zeros(number_of_voters + 1, dtype=np.int64)
+    np.cumsum(np.bincount(voters, minlength=number_of_voters), out=indptr[1:])
+    return indptr, projects
+
+def generate_data_columns(options: SyntheticOptions) -> Dict[str, Tuple[Dict[str, str], ColumnarGroup]]:
+    rng = np.random.default_rng(options.seed)
+    names = [str(d) for d in range(options.districts)]
+    voter_ids = np.arange(options.voters, dtype=np.int64)
+    voter_districts = rng.choice(max(options.districts, 1), size=options.voters,
+                                 p=zipf_weights(max(options.districts, 1), options.district_skew))
+
+    # The citywide election gets the same number of projects as a district
+    projects_per_group = np.full(options.districts + 1, options.projects // (options.districts + 1))
+    projects_per_group[:options.projects % (options.districts + 1)] += 1
+    first_ids = np.concatenate(([0], np.cumsum(projects_per_group)))
+
+    result: Dict[str, Tuple[Dict[str, str], ColumnarGroup]] = {}
+    for g, name in enumerate([*names, 'citywide']):
+        project_ids = np.arange(first_ids[g], first_ids[g + 1], dtype=np.int64)
+        costs = generate_costs(rng, len(project_ids), options)
+        voters = voter_ids if name == 'citywide' else voter_ids[voter_districts == g]
+        indptr, votes = generate_ballots(rng, len(voters), len(project_ids), options)
+
+        meta = { 'description': f'Synthetic election ({options})', 'unit': 'Synthetic' }
+        if name != 'citywide':
+            meta['subunit'] = name
+        meta['budget'] = str(int(costs.sum() * options.budget_share))
+
+        if name == 'citywide' and options.districts > 0:
+            district_codes = voter_districts.astype(np.int64)
+        else:
+            district_codes = np.full(len(voters), -1, dtype=np.int64)
+        result[name] = (meta, ColumnarGroup(project_ids, costs, voters, indptr, project_ids[votes],
+                                            district_codes, names if name == 'citywide' else []))
+    return result
+
+def generate_constraints(options: SyntheticOptions,
+                         columns: Dict[str, Tuple[Dict[str, str], ColumnarGroup]]) -> ConstraintsType:
+    if options.constraint_share <= 0:
+        return None
+    return { name: int(int(meta['budget']) * options.constraint_share) for name, (meta, _) in columns.items() }
+
+def generate_data(options: SyntheticOptions) -> Dict[str, InputDataPerGroup]:
+    columns = generate_data_columns(options)
+    constraints = generate_constraints(options, columns) or {}
+    return {
+        name: InputDataPerGroup(group=group.projects_group(), budget=int(meta['budget']), constraint=constraints.get(name))
+        for name, (meta, group) in columns.items()
+    }
+
+def save_election(options: SyntheticOptions, path: str) -> List[str]:
+    """
+    Saves the election as `.pb` files (and `constraints.json`, if constraints are generated) in the directory.
+    Returns paths of saved files.
+    """
+    os.makedirs(path, exist_ok=True)
+    columns = generate_data_columns(options)
+    paths: List[str] = []
+    for name, (meta, group) in columns.items():
+        paths.append(os.path.join(path, f"{name}.pb"))
+        save_file_columns(paths[-1], meta, group)
+
+    constraints = generate_constraints(options, columns)
+    if constraints is not None:
+        paths.append(os.path.join(path, "constraints.json"))
+        with open(paths[-1], 'w', encoding="utf-8") as f:
+            json.dump(constraints, f, indent=4)
+    return paths
+
+def parse_synthetic_options(spec: str) -> SyntheticOptions:
+    """
+    Parses options in format `voters=10000,projects=100` (options that are not given have default values).
+    """
+    options: Dict[str, Any] = {}
+    for option in filter(None, spec.split(',')):
+        splitted = option.split('=')
+        if len(splitted) != 2 or splitted[0] not in SyntheticOptions.__annotations__:
+            raise ValueError(f"Invalid synthetic election option: {option}")
+        name, value = splitted
+        options[name] = SyntheticOptions.__annotations__[name](value)
+    return SyntheticOptions(**options)
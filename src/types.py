@@ -1,5 +1,7 @@
-from typing import Dict, List, Optional
-from pydantic import BaseModel, Field
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, overload
+import numpy as np
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class Project(BaseModel):
@@ -22,3 +24,151 @@ class InputDataPerGroup(BaseModel):
     group: ProjectsGroup
     budget: int
     constraint: ConstraintType
+
+# Validating whole lists at once is faster than creating models one by one
+projects_adapter = TypeAdapter(List[Project])
+profiles_adapter = TypeAdapter(List[Profile])
+
+class ProfileView:
+    """
+    Profile of a voter stored in `ProfilesArray`. It has the same attributes as `Profile`,
+    but is created only when accessed and has no pydantic overhead.
+    """
+    __slots__ = ('id', 'votes', 'district')
+    id: int
+    votes: List[int]
+    district: Optional[str]
+
+    def __init__(self, _id: int, votes: List[int], district: Optional[str]):
+        self.id = _id
+        self.votes = votes
+        self.district = district
+
+    def __repr__(self) -> str:
+        return f"ProfileView(id={self.id}, votes={self.votes}, district={self.district!r})"
+
+class ProfilesArray(Sequence):
+    """
+    Profiles stored in arrays, used instead of a list of `Profile` in `ProjectsGroup.profiles`:
+    - votes of the voter `i` are `votes[votes_indptr[i]:votes_indptr[i + 1]]`,
+    - district of the voter `i` is `district_names[district_codes[i]]` (`None` if the code is `-1`).
+    Items are `ProfileView`. Code in hot paths should use the arrays (see `as_profiles_array`).
+    """
+    voter_ids: np.ndarray
+    votes_indptr: np.ndarray
+    votes: np.ndarray
+    district_codes: np.ndarray
+    district_names: List[str]
+
+    def __init__(self, voter_ids: np.ndarray, votes_indptr: np.ndarray, votes: np.ndarray,
+                 district_codes: np.ndarray, district_names: List[str]):
+        self.voter_ids = voter_ids
+        self.votes_indptr = votes_indptr
+        self.votes = votes
+        self.district_codes = district_codes
+        self.district_names = district_names
+
+    def __len__(self) -> int:
+        return len(self.voter_ids)
+
+    @overload
+    def __getitem__(self, index: int) -> ProfileView: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[ProfileView]: ...
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Profile index out of range")
+        code = int(self.district_codes[index])
+        return ProfileView(int(self.voter_ids[index]),
+                           self.votes[self.votes_indptr[index]:self.votes_indptr[index + 1]].tolist(),
+                           self.district_names[code] if code >= 0 else None)
+
+    def __iter__(self) -> Iterator[ProfileView]:
+        votes = self.votes.tolist()
+        indptr = self.votes_indptr.tolist()
+        districts = [*self.district_names, None]
+        for i, (_id, code) in enumerate(zip(self.voter_ids.tolist(), self.district_codes.tolist())):
+            yield ProfileView(_id, votes[indptr[i]:indptr[i + 1]], districts[code])
+
+    def ballot_sizes(self) -> np.ndarray:
+        return np.diff(self.votes_indptr)
+
+    def nbytes(self) -> int:
+        return self.voter_ids.nbytes + self.votes_indptr.nbytes + self.votes.nbytes + self.district_codes.nbytes
+
+    @staticmethod
+    def from_profiles(profiles: List[Profile]) -> 'ProfilesArray':
+        ballot_sizes = np.fromiter((len(p.votes) for p in profiles), dtype=np.int64, count=len(profiles))
+        votes_indptr = np.zeros(len(profiles) + 1, dtype=np.int64)
+        np.cumsum(ballot_sizes, out=votes_indptr[1:])
+        codes: Dict[str, int] = {}
+        district_codes = np.fromiter((codes.setdefault(p.district, len(codes)) if p.district is not None else -1
+                                      for p in profiles), dtype=np.int64, count=len(profiles))
+        return ProfilesArray(
+            np.fromiter((p.id for p in profiles), dtype=np.int64, count=len(profiles)),
+            votes_indptr,
+            np.fromiter((v for p in profiles for v in p.votes), dtype=np.int64, count=int(votes_indptr[-1])),
+            district_codes,
+            list(codes.keys()),
+        )
+
+    def to_models(self) -> List[Profile]:
+        return profiles_adapter.validate_python([
+            { '_id': p.id, 'votes': p.votes, 'district': p.district } for p in self
+        ])
+
+def as_profiles_array(profiles: List[Profile] | ProfilesArray) -> ProfilesArray:
+    """
+    Profiles in arrays, without copying if they are already stored in arrays.
+    """
+    if isinstance(profiles, ProfilesArray):
+        return profiles
+    return ProfilesArray.from_profiles(profiles)
+
+class ColumnarGroup:
+    """
+    Projects and votes from a single .pb file stored in arrays:
+    - votes of the voter `i` are `votes[votes_indptr[i]:votes_indptr[i + 1]]`,
+    - district of the voter `i` is `district_names[district_codes[i]]` (`-1` if not provided).
+    Pydantic models are built only for projects, profiles are kept in arrays (see `ProfilesArray`).
+    """
+    project_ids: np.ndarray
+    costs: np.ndarray
+    voter_ids: np.ndarray
+    votes_indptr: np.ndarray
+    votes: np.ndarray
+    district_codes: np.ndarray
+    district_names: List[str]
+
+    def __init__(self, project_ids: np.ndarray, costs: np.ndarray, voter_ids: np.ndarray,
+                 votes_indptr: np.ndarray, votes: np.ndarray, district_codes: np.ndarray,
+                 district_names: List[str]):
+        self.project_ids = project_ids
+        self.costs = costs
+        self.voter_ids = voter_ids
+        self.votes_indptr = votes_indptr
+        self.votes = votes
+        self.district_codes = district_codes
+        self.district_names = district_names
+        self._projects_group: ProjectsGroup | None = None
+
+    def projects(self) -> List[Project]:
+        return projects_adapter.validate_python([
+            { '_id': _id, 'cost': cost }
+            for _id, cost in zip(self.project_ids.tolist(), self.costs.tolist())
+        ])
+
+    def profiles(self) -> ProfilesArray:
+        return ProfilesArray(self.voter_ids, self.votes_indptr, self.votes, self.district_codes, self.district_names)
+
+    def projects_group(self) -> ProjectsGroup:
+        """
+        Group with profiles stored in arrays. It is shared, so it must not be modified.
+        """
+        if self._projects_group is None:
+            self._projects_group = ProjectsGroup.model_construct(projects=self.projects(), profiles=self.profiles())
+        return self._projects_group
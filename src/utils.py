@@ -1,12 +1,35 @@
-from copy import deepcopy
+import sys
 from typing import Callable, List, Dict, Tuple, TypeVar
 
-from .types import Profile, Project, ProjectsGroup, InputDataPerGroup
+import numpy as np
+
+from .types import Profile, Project, ProjectsGroup, InputDataPerGroup, ProfilesArray, as_profiles_array
+from .logger import logger
+from .instrumentation import timed
 
 
 T = TypeVar('T')
 T2 = TypeVar('T2')
 
+# Number of values kept by caches of values computed for data (looked up by identity of objects).
+# One is enough for a single election, `serve` keeps values for all its elections.
+memo_size = 1
+
+def recall(entries: List[T], matches: Callable[[T], bool]) -> T | None:
+    """
+    Returns the first matching entry of a cache and moves it to the front (entries are kept from the most recently used).
+    """
+    for i, entry in enumerate(entries):
+        if matches(entry):
+            entries.insert(0, entries.pop(i))
+            return entry
+    return None
+
+def remember(entries: List[T], entry: T) -> T:
+    entries.insert(0, entry)
+    del entries[memo_size:]
+    return entry
+
 def map_dict(f: Callable[[T], T2], data: Dict[str, T]) -> Dict[str, T2]:
     return { k: f(v) for k, v in data.items() }
 
@@ -26,29 +49,83 @@ def unzip_dict(data: Dict[str, tuple[T, T2]]) -> Tuple[Dict[str, T], Dict[str, T
     return { k: v[0] for k, v in data.items() }, { k: v[1] for k, v in data.items() }
 
 def get_profiles(data: Dict[str, ProjectsGroup]) -> List[Profile]:
-    return fold_dict(lambda x, g: x + g.profiles, [], data)
+    return [profile for group in data.values() for profile in group.profiles]
 
 def get_projects(data: Dict[str, ProjectsGroup]) -> List[Project]:
-    return fold_dict(lambda x, g: x + g.projects, [], data)
+    return [project for group in data.values() for project in group.projects]
+
+class VoterRegistry:
+    """
+    Index of voters of all groups. Every voter id gets a row (in the order of the first
+    appearance) and `group_rows[group][i]` is the row of the `i`-th profile of the group.
+    """
+    voter_ids: np.ndarray
+    group_rows: Dict[str, np.ndarray]
+
+    @timed("merge.registry")
+    def __init__(self, data: Dict[str, ProjectsGroup]):
+        ids = { name: as_profiles_array(group.profiles).voter_ids for name, group in data.items() }
+        unique_ids, first_index, inverse = np.unique(np.concatenate([np.zeros(0, dtype=np.int64), *ids.values()]),
+                                                     return_index=True, return_inverse=True)
+        order = np.argsort(first_index, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        self.voter_ids = unique_ids[order]
+        rows = rank[inverse]
+        self.group_rows = {}
+        offset = 0
+        for name, group_ids in ids.items():
+            self.group_rows[name] = rows[offset:offset + len(group_ids)]
+            offset += len(group_ids)
+
+    def __len__(self) -> int:
+        return len(self.voter_ids)
+
+# The last registries, reused as long as the same groups are passed
+voter_registries: List[Tuple[List[ProjectsGroup], VoterRegistry]] = []
+
+def get_voter_registry(data: Dict[str, ProjectsGroup]) -> VoterRegistry:
+    groups = list(data.values())
+    entry = recall(voter_registries, lambda e: len(e[0]) == len(groups) and all(a is b for a, b in zip(e[0], groups)))
+    if entry is None:
+        entry = remember(voter_registries, (groups, VoterRegistry(data)))
+    return entry[1]
 
 def merge_project_groups(data: Dict[str, ProjectsGroup]) -> ProjectsGroup:
-    profiles: Dict[int, Profile] = {}
-    
-    listed_profiles: List[Profile] = get_profiles(data)
-    for profile in listed_profiles:
-        if profile.id in profiles:
-            profiles[profile.id].votes += profile.votes
-        else:
-            profiles[profile.id] = deepcopy(profile)
-
-    return ProjectsGroup(
+    """
+    Joins profiles of the same voter from all groups (votes are concatenated in the order of groups,
+    the district is taken from the first profile of the voter). Profiles of the result are stored in arrays.
+    """
+    registry = get_voter_registry(data)
+    ballots = { name: as_profiles_array(group.profiles) for name, group in data.items() }
+
+    # Stable sort by voter keeps votes of a voter in the order of groups
+    rows = np.concatenate([np.zeros(0, dtype=np.int64),
+                           *(np.repeat(registry.group_rows[name], b.ballot_sizes()) for name, b in ballots.items())])
+    order = np.argsort(rows, kind='stable')
+    votes = np.concatenate([np.zeros(0, dtype=np.int64), *(b.votes for b in ballots.values())])[order]
+    votes_indptr = np.zeros(len(registry) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(registry)), out=votes_indptr[1:])
+
+    district_names: Dict[str, int] = {}
+    district_codes = np.full(len(registry), -1, dtype=np.int64)
+    assigned = np.zeros(len(registry), dtype=bool)
+    for name, b in ballots.items():
+        codes = np.array([*(district_names.setdefault(d, len(district_names)) for d in b.district_names), -1],
+                         dtype=np.int64)
+        group_rows, first = np.unique(registry.group_rows[name], return_index=True)
+        new = ~assigned[group_rows]
+        district_codes[group_rows[new]] = codes[b.district_codes[first[new]]]
+        assigned[group_rows] = True
+
+    return ProjectsGroup.model_construct(
         projects=get_projects(data),
-        profiles=list(profiles.values())
+        profiles=ProfilesArray(registry.voter_ids, votes_indptr, votes, district_codes, list(district_names.keys())),
     )
 
 def get_all_projects_dict(data: Dict[str, ProjectsGroup]) -> Dict[int, Project]:
-    projects: List[Project] = fold_dict(lambda x, g: x + g.projects, [], data)
-    return { p.id: p for p in projects }
+    return { p.id: p for group in data.values() for p in group.projects }
 
 def get_projects_from_list(projects_dict: dict[int, Project], projects: List[int]) -> List[Project]:
     return [projects_dict[p] for p in projects]
@@ -56,6 +133,7 @@ def get_projects_from_list(projects_dict: dict[int, Project], projects: List[int
 def can_afford(budget: int, projects: List[Project]) -> bool:
     return sum(p.cost for p in projects) <= budget
 
+@timed("merge")
 def merge_input_data(data: Dict[str, InputDataPerGroup]) -> InputDataPerGroup:
     return InputDataPerGroup(
         group=merge_project_groups(map_dict(lambda d: d.group, data)),
@@ -63,6 +141,37 @@ def merge_input_data(data: Dict[str, InputDataPerGroup]) -> InputDataPerGroup:
         constraint=None, # TODO
     )
 
+def approximate_size(group: ProjectsGroup) -> int:
+    """
+    Approximate number of bytes used by projects and profiles of the group (with their vote lists).
+    """
+    size = sys.getsizeof(group.projects)
+    for project in group.projects:
+        size += sys.getsizeof(project) + sys.getsizeof(project.__dict__)
+    if isinstance(group.profiles, ProfilesArray):
+        return size + group.profiles.nbytes()
+    size += sys.getsizeof(group.profiles)
+    for profile in group.profiles:
+        size += sys.getsizeof(profile) + sys.getsizeof(profile.__dict__) + sys.getsizeof(profile.votes) \
+                + sum(sys.getsizeof(v) for v in profile.votes)
+    return size
+
+# The last merged data, reused as long as the same data is passed
+merged_input_data: List[Tuple[Dict[str, InputDataPerGroup], InputDataPerGroup]] = []
+
+def get_merged_input_data(data: Dict[str, InputDataPerGroup]) -> InputDataPerGroup:
+    """
+    Returns `merge_input_data(data)`, merging only once for the same `data` object.
+    The result is shared, so it must not be modified.
+    """
+    entry = recall(merged_input_data, lambda e: e[0] is data)
+    if entry is None:
+        merged = merge_input_data(data)
+        logger.info("Merged data: %d profiles, %d projects, about %.1f MB",
+                     len(merged.group.profiles), len(merged.group.projects), approximate_size(merged.group) / 2**20)
+        entry = remember(merged_input_data, (data, merged))
+    return entry[1]
+
 def get_groups(data: Dict[str, InputDataPerGroup]) -> Dict[str, ProjectsGroup]:
     return map_dict(lambda d: d.group, data)
 
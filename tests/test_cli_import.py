@@ -0,0 +1,7 @@
+from src.bench import HEAVY_MODULES, IMPORT_TIME_BUDGET, measure_cli_import
+
+
+def test_cli_import_is_light():
+    cli_import = measure_cli_import(5)
+    assert cli_import["heavy_modules"] == [], f"{HEAVY_MODULES} should be imported only by commands that use them"
+    assert cli_import["median"] <= IMPORT_TIME_BUDGET
@@ -0,0 +1,87 @@
+import os
+from typing import Dict, List
+
+import pytest
+
+from src.parameters import get_default_parameters
+from src.load_data import load_data
+from src.registry import metrics_unary_desc, metrics_binary_desc
+from src.types import ProfilesArray
+from src.run import RunOptions, run
+from src.live import LiveElection
+from src.utils import get_merged_input_data, merge_input_data
+
+
+DATA_PATH = "example_data/01"
+METHODS = { "greedy", "mes_add_one", "mes_constrained" }
+
+def write_files(path: str, contents: Dict[str, List[str]], newline: str) -> None:
+    for filename, lines in contents.items():
+        with open(os.path.join(path, filename), 'w', encoding="utf-8", newline=newline) as f:
+            f.writelines(line + '\n' for line in lines)
+
+def append_rows(path: str, rows: Dict[str, List[str]], newline: str) -> None:
+    for filename, lines in rows.items():
+        with open(os.path.join(path, filename), 'a', encoding="utf-8", newline=newline) as f:
+            f.writelines(line + '\n' for line in lines)
+
+def read_files() -> Dict[str, List[str]]:
+    contents: Dict[str, List[str]] = {}
+    for filename in sorted(os.listdir(DATA_PATH)):
+        if filename.endswith('.pb'):
+            with open(os.path.join(DATA_PATH, filename), 'r', encoding="utf-8") as f:
+                contents[filename] = f.read().splitlines()
+    return contents
+
+def merged_profiles(profiles: ProfilesArray) -> Dict[int, tuple]:
+    return { p.id: (sorted(p.votes), p.district) for p in profiles }
+
+def run_options() -> RunOptions:
+    return RunOptions(methods_to_run=METHODS, metrics_to_run={ *metrics_unary_desc.keys(), *metrics_binary_desc.keys() },
+                      parameters=get_default_parameters(), constraints=None)
+
+@pytest.mark.parametrize("newline", ['\n', '\r\n'])
+def test_refresh_matches_full_load(tmp_path, newline: str):
+    contents = read_files()
+    # The last rows of two files are held back and appended after loading
+    held = { "0.pb": contents["0.pb"][-30:], "citywide.pb": contents["citywide.pb"][-200:] }
+    write_files(str(tmp_path), { name: lines[:len(lines) - len(held.get(name, []))] for name, lines in contents.items() },
+                newline)
+
+    live = LiveElection(str(tmp_path))
+    live.results(run_options())
+    append_rows(str(tmp_path), { name: lines[:10] for name, lines in held.items() }, newline)
+    assert live.refresh() == 20
+    live.results(run_options())
+    append_rows(str(tmp_path), { name: lines[10:] for name, lines in held.items() }, newline)
+    assert live.refresh() == 210
+
+    live_results = live.results(run_options())
+    data = load_data(str(tmp_path))
+    results = run(data, run_options())
+    assert merged_profiles(get_merged_input_data(live.data()).group.profiles) \
+        == merged_profiles(merge_input_data(data).group.profiles)
+    assert live.number_of_voters() == len(LiveElection(str(tmp_path)).ballots)
+    assert { name: o.selected_projects for name, o in live_results.outcomes.items() } \
+        == { name: o.selected_projects for name, o in results.outcomes.items() }
+    assert live_results.metrics_scores == results.metrics_scores
+    assert live_results.district_results == results.district_results
+
+def test_add_votes_of_unknown_group():
+    live = LiveElection(DATA_PATH)
+    with pytest.raises(ValueError):
+        live.add_votes("unknown", [1], [[1]])
+
+def test_add_votes_updates_merged_profiles():
+    live = LiveElection(DATA_PATH)
+    district = next(iter(live.groups.keys()))
+    citywide_project, district_project = live.groups["citywide"].projects[0].id, live.groups[district].projects[0].id
+    voter_id = 10**9
+    # The district of a voter is taken from their profile in the first group, as in a full load
+    live.add_votes("citywide", [voter_id], [[citywide_project]], ["citywide district"])
+    live.add_votes(district, [voter_id], [[district_project]], ["district"])
+
+    assert merged_profiles(get_merged_input_data(live.data()).group.profiles) \
+        == merged_profiles(merge_input_data(live.data()).group.profiles)
+    assert merged_profiles(get_merged_input_data(live.data()).group.profiles)[voter_id] \
+        == (sorted([citywide_project, district_project]), "district")
@@ -0,0 +1,36 @@
+from typing import Dict, List
+
+import pytest
+
+from src.types import InputDataPerGroup
+from src.parameters import get_default_parameters
+from src.load_data import load_data
+from src.methods import methods
+
+
+DATA_PATH = "example_data/01"
+
+def spent(data: Dict[str, InputDataPerGroup], selected: List[int]) -> Dict[str, int]:
+    chosen = set(selected)
+    return { name: sum(p.cost for p in d.group.projects if p.id in chosen) for name, d in data.items() }
+
+@pytest.mark.parametrize("share", [0.5, 0.9])
+@pytest.mark.parametrize("arithmetic", ["float", "fixed"])
+def test_feasible_lower_bounds_are_met(share: float, arithmetic: str):
+    # Lower bounds as made by `create_constraints.py` (greedy meets all of them)
+    data = load_data(DATA_PATH)
+    for d in data.values():
+        d.constraint = int(d.budget * share)
+    parameters = get_default_parameters()["mes_constrained"]
+    parameters["arithmetic"] = arithmetic
+
+    costs = spent(data, methods["mes_constrained"](data, parameters))
+    for name, d in data.items():
+        assert costs[name] >= d.constraint, name
+    assert sum(costs.values()) <= sum(d.budget for d in data.values())
+
+def test_without_constraints_same_as_mes_add_one():
+    data = load_data(DATA_PATH)
+    parameters = get_default_parameters()
+    assert methods["mes_constrained"](data, parameters["mes_constrained"]) \
+        == methods["mes_add_one"](data, parameters["mes_add_one"])
@@ -0,0 +1,79 @@
+import random
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from src.types import Profile, Project
+from src.parameters import get_default_parameters
+from src.mes_engine import ApprovalMatrix, equal_shares_add_one, find_stop, payment_caps
+from src.mes_pabutools import pabutools_equal_shares
+import src.registry # registers parameters of methods
+
+
+def random_instance(seed: int) -> Tuple[List[Project], List[Profile], int]:
+    rng = random.Random(seed)
+    number_of_projects = rng.randint(2, 6)
+    projects = [Project(_id=i + 1, cost=rng.randint(10, 200)) for i in range(number_of_projects)]
+    profiles = [
+        Profile(_id=v, votes=rng.sample(range(1, number_of_projects + 1), rng.randint(1, number_of_projects)), district=None)
+        for v in range(rng.randint(2, 8))
+    ]
+    return projects, profiles, rng.randint(10, sum(p.cost for p in projects))
+
+@pytest.mark.parametrize("seed", range(100))
+@pytest.mark.parametrize("step", [1, 5])
+def test_add_one_matches_pabutools(seed: int, step: int):
+    projects, profiles, budget = random_instance(seed)
+    matrix = ApprovalMatrix.from_profiles(projects, profiles)
+    expected = sorted(pabutools_equal_shares(budget, projects, profiles, step))
+
+    assert sorted(equal_shares_add_one(matrix, budget, step, "linear")) == expected
+    default_search = get_default_parameters()["mes_add_one"]["search"]
+    assert sorted(equal_shares_add_one(matrix, budget, step, default_search)) == expected
+
+def test_galloping_is_not_exact_when_stop_is_not_monotone():
+    # Outcomes of increments 0, 1, ... are exhaustive, then not, then exhaustive again
+    projects, profiles, budget = random_instance(141)
+    matrix = ApprovalMatrix.from_profiles(projects, profiles)
+
+    linear = sorted(equal_shares_add_one(matrix, budget, 1, "linear"))
+    assert linear == sorted(pabutools_equal_shares(budget, projects, profiles, 1))
+    assert sorted(equal_shares_add_one(matrix, budget, 1, "galloping")) != linear
+    for method in ["mes_add_one", "mes_constrained", "modified_mes"]:
+        assert get_default_parameters()[method]["search"] == "linear"
+
+@pytest.mark.parametrize("first", [0, 1])
+@pytest.mark.parametrize("limit", [None, 7, 40])
+def test_galloping_matches_linear_for_monotone_stop(first: int, limit: int | None):
+    for stop_from in range(first, 50):
+        should_stop = lambda iteration: iteration >= stop_from
+        assert find_stop(should_stop, first, "galloping", limit) == find_stop(should_stop, first, "linear", limit)
+
+def test_find_stop_unknown_search():
+    with pytest.raises(ValueError):
+        find_stop(lambda _: True, 0, "binary")
+
+@pytest.mark.parametrize("step", [0, -1])
+def test_add_one_rejects_non_positive_step(step: int):
+    projects, profiles, budget = random_instance(0)
+    with pytest.raises(ValueError):
+        equal_shares_add_one(ApprovalMatrix.from_profiles(projects, profiles), budget, step)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_payment_caps_match_sorted_budgets(seed: int):
+    projects, profiles, _ = random_instance(seed)
+    matrix = ApprovalMatrix.from_profiles(projects, profiles)
+    rng = np.random.default_rng(seed)
+    budgets = rng.integers(0, 100, matrix.number_of_classes())
+    rows = np.flatnonzero(matrix.supporters_count() > 0)
+
+    caps, affordable = payment_caps(matrix, budgets, matrix.costs, rows)
+    for row, cap, can_afford in zip(rows.tolist(), caps.tolist(), affordable.tolist()):
+        supporters = matrix.supporters[matrix.supporters_indptr[row]:matrix.supporters_indptr[row + 1]]
+        paid = lambda t: sum(int(matrix.weights[c]) * min(int(budgets[c]), t) for c in supporters)
+        cost = int(matrix.costs[row])
+        assert can_afford == (paid(10**9) >= cost)
+        if can_afford:
+            # The smallest integer cap that covers the cost
+            assert paid(cap) >= cost and (cap == 0 or paid(cap - 1) < cost)
@@ -0,0 +1,16 @@
+from src.parameters import get_default_parameters
+from src.load_data import load_data
+from src.run import RunOptions, run
+
+
+DATA_PATH = "example_data/01"
+
+def test_shared_data_is_prepared_before_methods():
+    data = load_data(DATA_PATH)
+    run_options = RunOptions({ "mes_add_one", "modified_mes" }, set(), get_default_parameters(), {})
+    profile = run(data, run_options).profile
+    assert profile is not None
+
+    assert { "prepare.merge", "prepare.approval_matrix" } <= profile["prepare"]["timers"].keys()
+    for method_profile in profile["methods"].values():
+        assert not any(name.startswith("merge") or name == "mes.build_matrix" for name in method_profile["timers"])
@@ -0,0 +1,38 @@
+import pytest
+
+from src import serve
+from src.load_data import load_data
+from src.methods import methods
+from src.parameters import get_default_parameters
+
+
+DATA_PATH = "example_data/01"
+
+@pytest.fixture(scope="module")
+def election():
+    serve.init_worker({ DATA_PATH: load_data(DATA_PATH) })
+    return serve.worker_elections[DATA_PATH]
+
+def test_what_if_keeps_prepared_data(election):
+    prepared = serve.worker_prepared[DATA_PATH]
+    budgets = { name: d.budget // 2 for name, d in election.items() }
+    response = serve.run_request({ "methods": ["mes_add_one"], "metrics": [], "budgets": budgets })
+    assert serve.worker_prepared[DATA_PATH] is prepared
+
+    data = load_data(DATA_PATH)
+    for name, d in data.items():
+        d.budget = budgets[name]
+    assert response["methods_outcomes"]["mes_add_one"] \
+        == methods["mes_add_one"](data, get_default_parameters()["mes_add_one"])
+
+@pytest.mark.parametrize("request_body", [
+    { "constraints": { "unknown": 1 } },
+    { "constraints": { "0": "1000" } },
+    { "constraints": { "0": 1.5 } },
+    { "constraints": ["0"] },
+    { "budgets": { "0": None } },
+    { "budgets": { "0": -1 } },
+])
+def test_invalid_what_if_values(election, request_body):
+    with pytest.raises(ValueError):
+        serve.run_request({ "methods": ["greedy"], "metrics": [], **request_body })